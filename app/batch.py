@@ -0,0 +1,283 @@
+"""Non-interactive commands for scripts and cron jobs.
+
+    python main.py batch report --all-users
+    python main.py batch add --user alice --amount 12.50 --category Food --type expense
+    python main.py batch import --user alice statement.csv
+    python main.py batch export --all-users --output-dir reports/
+    python main.py batch budget set --user alice Food 300
+    python main.py batch budget status --all-users
+    python main.py batch recurring add --user alice --amount 1200 --category Rent --type expense --schedule monthly --start 2024-01-01
+    python main.py batch recurring run --all-users
+
+Every command prints one JSON document. Users are picked by name with --user
+(repeatable) or with --all-users, and all of them are served from a single
+database connection. Errors are printed as {"error": ...} on stderr with exit
+status 1.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+from datetime import date
+from budget import Budget, budget_status
+from config import load_config, load_currency_symbol, load_import_batch_size
+from database import Database
+from export import export_report_to_csv, export_users_parallel
+from importer import import_transactions, normalize_date
+from money import to_major, to_minor
+from report import generate_report
+from timeseries import PERIODS, TimeSeries
+from transaction import Transaction
+
+
+class BatchError(Exception):
+    """A problem with the command line, reported as JSON instead of a traceback"""
+
+
+def _money(minor):
+    # JSON numbers in currency units; amounts are cents everywhere before this
+    return to_major(minor)
+
+
+def _select_users(db, args):
+    if getattr(args, 'all_users', False):
+        return db.get_all_users()
+    if not args.users:
+        raise BatchError("give --user NAME or --all-users")
+    users = []
+    for username in args.users:
+        user = db.get_user_by_username(username)
+        if user is None:
+            raise BatchError(f"unknown user {username!r}")
+        users.append(user)
+    return users
+
+
+def _single_user(db, args):
+    users = _select_users(db, args)
+    if len(users) != 1:
+        raise BatchError("this command takes exactly one --user")
+    return users[0]
+
+
+def cmd_add(db, args):
+    user = _single_user(db, args)
+    if args.type not in ('income', 'expense'):
+        raise BatchError("--type must be income or expense")
+    date = normalize_date(args.date)
+    db.add_transaction(Transaction(args.amount, args.category, args.description, args.type, date), user.id)
+    alerts = []
+    if args.type == 'expense':
+        alerts = [
+            {'category': category, 'period': period, 'amount': _money(amount), 'spent': _money(spent), 'status': status}
+            for category, period, amount, spent, status in Budget(db, user.id).evaluate_budgets(args.category)
+            if status != 'ok'
+        ]
+    return {'user': user.username, 'added': 1, 'budget_alerts': alerts}
+
+
+def cmd_import(db, args):
+    user = _single_user(db, args)
+    inserted, skipped = import_transactions(db, user.id, args.file, load_import_batch_size())
+    return {'user': user.username, 'file': args.file, 'inserted': inserted, 'skipped': skipped}
+
+
+def cmd_report(db, args):
+    reports = []
+    for user in _select_users(db, args):
+        income, expenses, net, categories = generate_report(db, args.currency, user.id, return_data=True)
+        report = {
+            'user': user.username,
+            'user_id': user.id,
+            'income': _money(income),
+            'expenses': _money(expenses),
+            'net': _money(net),
+            'categories': {category: _money(amount) for category, amount in categories.items()},
+        }
+        if args.period:
+            series = TimeSeries.load(db, user.id, args.period)
+            report['trend'] = [
+                {'period': bucket, 'income': _money(i), 'expenses': _money(e), 'net': _money(n), 'balance': _money(b)}
+                for bucket, i, e, n, b in series.rows()[-args.limit:]
+            ]
+        reports.append(report)
+    return {'currency': args.currency, 'reports': reports}
+
+
+def _export_filename(user):
+    # Usernames are free text, so keep only characters that are safe in a file name
+    safe_name = re.sub(r'[^\w.-]', '_', user.username)
+    return f"{user.id}_{safe_name}.csv"
+
+
+def cmd_export(db, args):
+    users = _select_users(db, args)
+    os.makedirs(args.output_dir, exist_ok=True)
+    jobs = [(user.id, os.path.join(args.output_dir, _export_filename(user))) for user in users]
+    options = {'start_date': args.start, 'end_date': args.end, 'category': args.category}
+    workers = args.workers if args.workers is not None else load_config()['EXPORT_WORKERS'] or os.cpu_count() or 1
+    usernames = {user.id: user.username for user in users}
+
+    if workers == 1 or len(jobs) < 2:
+        exports = [
+            {'user': usernames[user_id], 'file': filename,
+             'rows': export_report_to_csv(db, args.currency, user_id, filename, **options)}
+            for user_id, filename in jobs
+        ]
+        return {'exports': exports}
+
+    results, worker_stats = export_users_parallel(db.path, args.currency, jobs, workers, **options)
+    exports = [{'user': usernames[user_id], 'file': filename, 'rows': rows} for user_id, filename, rows in results]
+    workers = [
+        {'pid': pid, 'users': stats['users'], 'rows': stats['rows'], 'seconds': round(stats['seconds'], 3),
+         'rows_per_second': round(stats['rows'] / stats['seconds']) if stats['seconds'] else None}
+        for pid, stats in sorted(worker_stats.items())
+    ]
+    return {'exports': exports, 'workers': workers}
+
+
+def cmd_budget(db, args):
+    if args.action == 'set':
+        user = _single_user(db, args)
+        db.set_budget(user.id, args.category, args.amount, args.period)
+        return {'user': user.username, 'category': args.category, 'period': args.period, 'amount': _money(args.amount)}
+    if args.action == 'remove':
+        user = _single_user(db, args)
+        db.delete_budget(user.id, args.category, args.period)
+        return {'user': user.username, 'category': args.category, 'period': args.period, 'removed': True}
+
+    budgets = []
+    for user in _select_users(db, args):
+        for category, period, amount, spent in db.get_budget_status(user.id, args.category):
+            budgets.append({'user': user.username, 'category': category, 'period': period, 'amount': _money(amount),
+                            'spent': _money(spent), 'status': budget_status(amount, spent)})
+    return {'budgets': budgets}
+
+
+def cmd_recurring(db, args):
+    if args.action == 'add':
+        user = _single_user(db, args)
+        if args.type not in ('income', 'expense'):
+            raise BatchError("--type must be income or expense")
+        transaction = Transaction(args.amount, args.category, args.description, args.type)
+        rule_id = db.add_recurring_rule(user.id, transaction, args.schedule, args.start, args.end)
+        return {'user': user.username, 'rule_id': rule_id, 'added': db.materialize_recurring(user.id)}
+    if args.action == 'remove':
+        user = _single_user(db, args)
+        if not db.delete_recurring_rule(user.id, args.rule_id):
+            raise BatchError(f"{user.username} has no recurring rule {args.rule_id}")
+        return {'user': user.username, 'rule_id': args.rule_id, 'removed': True}
+    if args.action == 'run':
+        today = date.fromisoformat(args.date) if args.date else None
+        # Everyone's rules catch up in a single transaction
+        if args.all_users:
+            return {'added': db.materialize_recurring(today=today)}
+        return {'added': sum(db.materialize_recurring(user.id, today) for user in _select_users(db, args))}
+
+    rules = []
+    for user in _select_users(db, args):
+        for rule_id, txn, schedule, start_date, end_date, last_run in db.get_recurring_rules(user.id):
+            rules.append({'user': user.username, 'rule_id': rule_id, 'amount': _money(txn.amount), 'category': txn.category,
+                          'description': txn.description, 'type': txn.type, 'schedule': schedule,
+                          'start': start_date, 'end': end_date, 'last_run': last_run})
+    return {'rules': rules}
+
+
+def _add_user_options(parser, many=True):
+    parser.add_argument('--user', dest='users', action='append', metavar='NAME', help='username (repeatable)')
+    if many:
+        parser.add_argument('--all-users', action='store_true', help='every user in the database')
+
+
+def build_parser():
+    # Shared options, accepted after any subcommand
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--db', help='database file (default: DB_FILE from config.json)')
+    common.add_argument('--indent', type=int, default=None, help='pretty-print the JSON output')
+
+    parser = argparse.ArgumentParser(prog='main.py batch', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    add = commands.add_parser('add', help='add one transaction', parents=[common])
+    _add_user_options(add, many=False)
+    add.add_argument('--amount', type=to_minor, required=True)
+    add.add_argument('--category', required=True)
+    add.add_argument('--description', default='')
+    add.add_argument('--type', required=True, help='income or expense')
+    add.add_argument('--date', help='ISO date or date-time (default: now)')
+    add.set_defaults(handler=cmd_add)
+
+    import_ = commands.add_parser('import', help='import a CSV or OFX statement', parents=[common])
+    _add_user_options(import_, many=False)
+    import_.add_argument('file')
+    import_.set_defaults(handler=cmd_import)
+
+    report = commands.add_parser('report', help='totals per user, optionally with a trend', parents=[common])
+    _add_user_options(report)
+    report.add_argument('--period', choices=PERIODS, help='include a trend bucketed by this period')
+    report.add_argument('--limit', type=int, default=12, help='number of trend periods (default 12)')
+    report.set_defaults(handler=cmd_report)
+
+    export = commands.add_parser('export', help='write one CSV per user', parents=[common])
+    _add_user_options(export)
+    export.add_argument('--output-dir', default='.')
+    export.add_argument('--start', help='first date (YYYY-MM-DD)')
+    export.add_argument('--end', help='last date (YYYY-MM-DD)')
+    export.add_argument('--category')
+    export.add_argument('--workers', type=int, help='export processes (default: EXPORT_WORKERS, 1 runs in this process)')
+    export.set_defaults(handler=cmd_export)
+
+    budget = commands.add_parser('budget', help='set, remove or check budgets')
+    actions = budget.add_subparsers(dest='action', required=True)
+    budget_set = actions.add_parser('set', parents=[common])
+    _add_user_options(budget_set, many=False)
+    budget_set.add_argument('category')
+    budget_set.add_argument('amount', type=to_minor)
+    budget_set.add_argument('--period', choices=Budget.PERIODS, default='monthly')
+    budget_remove = actions.add_parser('remove', parents=[common])
+    _add_user_options(budget_remove, many=False)
+    budget_remove.add_argument('category')
+    budget_remove.add_argument('--period', choices=Budget.PERIODS, default='monthly')
+    budget_status_ = actions.add_parser('status', parents=[common])
+    _add_user_options(budget_status_)
+    budget_status_.add_argument('--category')
+    budget.set_defaults(handler=cmd_budget)
+
+    recurring = commands.add_parser('recurring', help='add, list, remove or run recurring transactions')
+    actions = recurring.add_subparsers(dest='action', required=True)
+    recurring_add = actions.add_parser('add', parents=[common])
+    _add_user_options(recurring_add, many=False)
+    recurring_add.add_argument('--amount', type=to_minor, required=True)
+    recurring_add.add_argument('--category', required=True)
+    recurring_add.add_argument('--description', default='')
+    recurring_add.add_argument('--type', required=True, help='income or expense')
+    recurring_add.add_argument('--schedule', required=True,
+                               help="daily, weekly, monthly or 'day-of-month month day-of-week' such as '1,15 * *'")
+    recurring_add.add_argument('--start', required=True, help='first date (YYYY-MM-DD)')
+    recurring_add.add_argument('--end', help='last date (YYYY-MM-DD)')
+    recurring_list = actions.add_parser('list', parents=[common])
+    _add_user_options(recurring_list)
+    recurring_remove = actions.add_parser('remove', parents=[common])
+    _add_user_options(recurring_remove, many=False)
+    recurring_remove.add_argument('rule_id', type=int)
+    recurring_run = actions.add_parser('run', parents=[common])
+    _add_user_options(recurring_run)
+    recurring_run.add_argument('--date', help='add what is due up to this date (default: today)')
+    recurring.set_defaults(handler=cmd_recurring)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.currency = load_currency_symbol()
+    try:
+        with Database(args.db) as db:
+            result = args.handler(db, args)
+    except (BatchError, ValueError, OSError) as e:
+        print(json.dumps({'error': str(e)}), file=sys.stderr)
+        return 1
+    print(json.dumps(result, indent=args.indent))
+    return 0
@@ -1,20 +1,53 @@
+from money import format_amount
+
+# Share of a budget after which spending is reported as close to the limit
+WARNING_THRESHOLD = 0.9
+
+def budget_status(amount, spent):
+    if spent > amount:
+        return 'exceeded'
+    if spent > amount * WARNING_THRESHOLD:
+        return 'warning'
+    return 'ok'
+
 class Budget:
-    def __init__(self, currency_symbol='$'):
-        self.budgets = {}
+    """A user's budgets, stored in the database with a running spend per period"""
+
+    PERIODS = ('monthly', 'weekly')
+
+    def __init__(self, db, user_id, currency_symbol='$'):
+        self.db = db
+        self.user_id = user_id
         self.currency_symbol = currency_symbol
 
-    def set_budget(self, category, amount):
-        self.budgets[category] = amount
-        print(f"Budget set: {category} - {self.currency_symbol}{amount:.2f}")
+    def set_budget(self, category, amount, period='monthly'):
+        if period not in self.PERIODS:
+            raise ValueError(f"period must be one of {', '.join(self.PERIODS)}")
+        self.db.set_budget(self.user_id, category, amount, period)
+        print(f"Budget set: {category} ({period}) - {format_amount(amount, self.currency_symbol)}")
+
+    def remove_budget(self, category, period='monthly'):
+        self.db.delete_budget(self.user_id, category, period)
+
+    def evaluate_budgets(self, category=None):
+        """Return (category, period, amount, spent, status) for every budget in one query"""
+        return [
+            (cat, period, amount, spent, budget_status(amount, spent))
+            for cat, period, amount, spent in self.db.get_budget_status(self.user_id, category)
+        ]
 
-    def check_budget(self, category, spent):
-        if category in self.budgets:
-            budget = self.budgets[category]
-            if spent > budget:
-                print(f"Alert! {category} budget exceeded by {self.currency_symbol}{spent - budget:.2f}")
-            elif spent > budget * 0.9:
-                print(f"Warning: {category} spending is close to budget ({self.currency_symbol}{spent:.2f} of {self.currency_symbol}{budget:.2f})")
+    def check_budget(self, category):
+        """Print and return alerts for the category's current spend"""
+        alerts = []
+        for cat, period, amount, spent, status in self.evaluate_budgets(category):
+            if status == 'exceeded':
+                alerts.append(f"Alert! {cat} {period} budget exceeded by {format_amount(spent - amount, self.currency_symbol)}")
+            elif status == 'warning':
+                alerts.append(f"Warning: {cat} {period} spending is close to budget ({format_amount(spent, self.currency_symbol)} of {format_amount(amount, self.currency_symbol)})")
+        for alert in alerts:
+            print(alert)
+        return alerts
 
     def view_budgets(self):
-        for category, amount in self.budgets.items():
-            print(f"{category}: {self.currency_symbol}{amount:.2f}")
+        for category, period, amount, spent, status in self.evaluate_budgets():
+            print(f"{category} ({period}): {format_amount(spent, self.currency_symbol)} of {format_amount(amount, self.currency_symbol)} [{status}]")
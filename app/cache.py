@@ -0,0 +1,53 @@
+import threading
+from collections import OrderedDict
+from config import load_config
+
+
+class ReportCache:
+    """LRU cache for report results.
+
+    Entries are keyed by (database path, user_id, kind, params, data version). The data version
+    is a per-user counter bumped on every write, so a write makes all of that
+    user's older entries unreachable; invalidate() also drops them right away.
+    """
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(self, db, user_id, kind, params, compute):
+        key = (db.path, user_id, kind, params, db.get_data_version(user_id))
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+
+        value = compute()
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+        return value
+
+    def invalidate(self, user_id):
+        with self.lock:
+            for key in [key for key in self.entries if key[1] == user_id]:
+                del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            return {'size': len(self.entries), 'maxsize': self.maxsize, 'hits': self.hits, 'misses': self.misses}
+
+
+# Shared by every Database in the process, including the GUI worker threads
+report_cache = ReportCache(int(load_config()['REPORT_CACHE_SIZE']))
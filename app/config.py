@@ -1,24 +1,65 @@
 import json
 import os
 
+# Settings used when config.json does not provide them
+DEFAULT_CONFIG = {
+    'DB_FILE': 'finance_tracker.db',
+    'DATE_FORMAT': '%Y-%m-%d %H:%M:%S',
+    'CURRENCY_SYMBOL': '$',
+    'IMPORT_BATCH_SIZE': 1000,
+    'REPORT_CACHE_SIZE': 128,  # report results kept in memory
+    'EXPORT_WORKERS': None,  # processes for batch exports, None for one per CPU
+    # SQLite tuning, applied to every connection
+    'SQLITE_JOURNAL_MODE': 'WAL',
+    'SQLITE_SYNCHRONOUS': 'NORMAL',
+    'SQLITE_CACHE_SIZE': -20000,  # negative means KiB, so about 20 MB
+    'SQLITE_MMAP_SIZE': 268435456,
+    'SQLITE_TEMP_STORE': 'MEMORY',
+    'SQLITE_BUSY_TIMEOUT': 5000,  # milliseconds to wait for a lock
+    # Password hashing; stored hashes with other parameters are upgraded on login
+    'PASSWORD_SCHEME': 'scrypt',  # or pbkdf2_sha256
+    'SCRYPT_N': 16384,
+    'SCRYPT_R': 8,
+    'SCRYPT_P': 1,
+    'PBKDF2_ITERATIONS': 600000,
+    'AUTH_CACHE_TTL': 300,  # seconds a successful login is remembered, 0 to disable
+    'SESSION_TTL': 604800,  # seconds a session token stays valid after login (a week)
+    'SESSION_CACHE_TTL': 60,  # seconds a checked token is trusted without the database, 0 to disable
+    # Local HTTP API (python main.py serve)
+    'SERVER_HOST': '127.0.0.1',
+    'SERVER_PORT': 8765,
+    'SERVER_WORKERS': 8,  # pooled connections and threads running database calls
+    'SERVER_PAGE_SIZE': 100,  # transactions per page unless ?limit= asks for fewer or more
+    # Instrumentation
+    'SLOW_QUERY_MS': 100,  # queries slower than this are logged with their plan
+    'SLOW_QUERY_LOG': None,  # file for the slow-query log, stderr when unset
+    'METRICS_FILE': None,  # JSON file the metrics are dumped to on exit
+}
+
 def save_currency_symbol(symbol):
-    config = {
-        'DB_FILE': 'finance_tracker.db',
-        'DATE_FORMAT': '%Y-%m-%d %H:%M:%S',
-        'CURRENCY_SYMBOL': symbol,
-    }
+    # Keep any other settings already in config.json, but write no defaults,
+    # so later changes to DEFAULT_CONFIG still take effect
+    config = _read_config_file()
+    config['CURRENCY_SYMBOL'] = symbol
     with open('config.json', 'w') as config_file:
         json.dump(config, config_file)
 
-def load_config():
+def _read_config_file():
     try:
         with open('config.json', 'r') as config_file:
-            config = json.load(config_file)
-            return config
+            return json.load(config_file)
     except FileNotFoundError:
-        return {'CURRENCY_SYMBOL': '$'}
+        return {}
+
+def load_config():
+    config = dict(DEFAULT_CONFIG)
+    config.update(_read_config_file())
+    return config
+
+def load_import_batch_size():
+    config = load_config()
+    return int(config.get('IMPORT_BATCH_SIZE', 1000))
 
 def load_currency_symbol():
     config = load_config()
     return config.get('CURRENCY_SYMBOL', '$')
-
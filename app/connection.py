@@ -0,0 +1,94 @@
+import sqlite3
+import time
+from config import load_config
+from metrics import metrics, log_slow_query
+
+JOURNAL_MODES = ('DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF')
+SYNCHRONOUS_MODES = ('OFF', 'NORMAL', 'FULL', 'EXTRA')
+TEMP_STORES = ('DEFAULT', 'FILE', 'MEMORY')
+
+
+def _choice(value, allowed, setting):
+    value = str(value).upper()
+    if value not in allowed:
+        raise ValueError(f"{setting} must be one of {', '.join(allowed)}, not {value!r}")
+    return value
+
+
+# Only these statements have a query plan worth logging
+EXPLAINABLE = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH', 'REPLACE')
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor that times every statement and logs the slow ones with their query plan"""
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._record(sql, parameters, (time.perf_counter() - start) * 1000)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._record(sql, None, (time.perf_counter() - start) * 1000)
+
+    def _record(self, sql, parameters, elapsed_ms):
+        verb = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else ''
+        metrics.record(f'sql.{verb.lower()}', elapsed_ms)
+        if elapsed_ms < self.connection.slow_query_ms:
+            return
+        plan = None
+        if parameters is not None and verb in EXPLAINABLE:
+            try:
+                # A plain cursor, so explaining is neither timed nor logged itself
+                rows = sqlite3.Cursor(self.connection).execute(f'EXPLAIN QUERY PLAN {sql}', parameters).fetchall()
+                plan = [row[-1] for row in rows]
+            except sqlite3.Error:
+                pass
+        log_slow_query(sql, elapsed_ms, plan)
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    slow_query_ms = float('inf')
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def connect(path=None, readonly=False, config=None, check_same_thread=True):
+    """Open a SQLite connection with the PRAGMAs from the app configuration.
+
+    Read-only connections are opened with mode=ro, so they can never take the
+    write lock; in WAL mode any number of them can read while one writer commits.
+    """
+    config = config or load_config()
+    path = path or config['DB_FILE']
+    timeout = config['SQLITE_BUSY_TIMEOUT'] / 1000
+
+    if readonly:
+        conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True, timeout=timeout, factory=InstrumentedConnection,
+                               check_same_thread=check_same_thread)
+    else:
+        conn = sqlite3.connect(path, timeout=timeout, factory=InstrumentedConnection,
+                               check_same_thread=check_same_thread)
+        # The journal mode is stored in the database file, so only the writer sets it
+        conn.execute(f"PRAGMA journal_mode = {_choice(config['SQLITE_JOURNAL_MODE'], JOURNAL_MODES, 'SQLITE_JOURNAL_MODE')}")
+
+    conn.execute(f"PRAGMA synchronous = {_choice(config['SQLITE_SYNCHRONOUS'], SYNCHRONOUS_MODES, 'SQLITE_SYNCHRONOUS')}")
+    conn.execute(f"PRAGMA cache_size = {int(config['SQLITE_CACHE_SIZE'])}")
+    conn.execute(f"PRAGMA mmap_size = {int(config['SQLITE_MMAP_SIZE'])}")
+    conn.execute(f"PRAGMA temp_store = {_choice(config['SQLITE_TEMP_STORE'], TEMP_STORES, 'SQLITE_TEMP_STORE')}")
+    # Enable foreign key constraints
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.slow_query_ms = float(config['SLOW_QUERY_MS'])
+    return conn
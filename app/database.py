@@ -1,89 +1,630 @@
+import os
 import sqlite3
-from transaction import Transaction
-from user import User
+from transaction import Transaction, TransactionBatch, TRANSACTION_COLUMNS, TRANSACTION_SOURCE
+from user import User, USER_COLUMNS
+from migrations import migrate, explain_query_plan, rebuild_transaction_summary, summary_key, budget_period_start
+from connection import connect
+from config import load_config
+from cache import report_cache
+from metrics import instrument_class
+from money import amount_sql
+
+# Queries on the hot path, checked by explain_hot_queries()
+HOT_QUERIES = {
+    'get_all_transactions': (f'SELECT {TRANSACTION_COLUMNS} FROM {TRANSACTION_SOURCE} WHERE t.user_id = ?', (1,)),
+    'get_recent_transactions': (f'SELECT {TRANSACTION_COLUMNS} FROM {TRANSACTION_SOURCE} WHERE t.user_id = ? ORDER BY t.date DESC, t.id DESC LIMIT ?', (1, 5)),
+    'iter_transactions': (f'SELECT {TRANSACTION_COLUMNS} FROM {TRANSACTION_SOURCE} WHERE t.user_id = ? AND (t.date, t.id) < (?, ?) ORDER BY t.date DESC, t.id DESC LIMIT ?', (1, '2024-01-01 00:00:00', 1, 100)),
+    'stream_transactions': (f"SELECT t.date, t.type, {amount_sql('t.amount')}, c.name, t.description FROM {TRANSACTION_SOURCE} WHERE t.user_id = ? AND t.date >= ? AND t.date < date(?, '+1 day') ORDER BY t.date, t.id", (1, '2024-01-01', '2024-12-31')),
+    'add_transactions': ('SELECT 1 FROM transactions WHERE user_id = ? AND date = ? AND amount = ? AND type = ? AND description IS ? AND id <= ?', (1, '2024-01-01 00:00:00', 100, 'expense', '', 1000)),
+    'search_transactions': ("SELECT t.id FROM transactions_fts f CROSS JOIN transactions t ON t.id = f.rowid WHERE transactions_fts MATCH ? AND t.user_id = ? ORDER BY f.rowid DESC LIMIT ?", ('"coffee"*', 1, 50)),
+    'get_category_totals': ('SELECT s.type, c.name, SUM(s.total) FROM transaction_summary s LEFT JOIN categories c ON c.id = s.category_id WHERE s.user_id = ? GROUP BY s.type, s.category_id', (1,)),
+    'count_transactions': ('SELECT IFNULL(SUM(count), 0) FROM transaction_summary WHERE user_id = ?', (1,)),
+    'get_categories': ('SELECT name FROM categories WHERE user_id = ? ORDER BY name', (1,)),
+    'clear_transactions': ('DELETE FROM transactions WHERE user_id = ?', (1,)),
+}
+
+# Most users have a few dozen categories; the cache is simply emptied when it fills up
+CATEGORY_CACHE_SIZE = 1024
 
 class Database:
-    def __init__(self):
-        self.conn = sqlite3.connect('finance_tracker.db')
-        # Enable foreign key constraints
-        self.conn.execute("PRAGMA foreign_keys = ON")
-        self.create_tables()
+    def __init__(self, path=None, readonly=False, shared=False):
+        # Path and PRAGMAs default to the values in config.json. A shared
+        # Database may move between threads, as long as only one uses it at a time.
+        self.path = os.path.abspath(path or load_config()['DB_FILE'])
+        self.readonly = readonly
+        self.shared = shared
+        self._conn = None
+        # (user_id, name) -> categories.id; ids never change once assigned
+        self._category_ids = {}
+
+    @property
+    def conn(self):
+        """The connection, opened and migrated on first use so startup does not wait for it"""
+        if self._conn is None:
+            self._conn = connect(self.path, self.readonly, check_same_thread=not self.shared)
+            if not self.readonly:
+                try:
+                    self.create_tables()
+                except Exception:
+                    self.close()
+                    raise
+        return self._conn
 
     def create_tables(self):
+        # Creates the schema on a new database and upgrades older files in place
+        migrate(self.conn)
+
+    def _category_id(self, cursor, user_id, name):
+        """Id of the user's category called name, creating the category on first use"""
+        if name is None:
+            return None
+        key = (user_id, name)
+        category_id = self._category_ids.get(key)
+        if category_id is None:
+            cursor.execute('INSERT OR IGNORE INTO categories (user_id, name) VALUES (?, ?)', key)
+            cursor.execute('SELECT id FROM categories WHERE user_id = ? AND name = ?', key)
+            category_id = cursor.fetchone()[0]
+            if len(self._category_ids) >= CATEGORY_CACHE_SIZE:
+                self._category_ids.clear()
+            self._category_ids[key] = category_id
+        return category_id
+
+    def _rollback(self):
+        # Categories created by the rolled back transaction are gone again
+        self.conn.rollback()
+        self._category_ids.clear()
+
+    def discard_transaction(self):
+        """Roll back a transaction left open by a failed call, so the connection can be reused"""
+        if self._conn is not None and self._conn.in_transaction:
+            self._rollback()
+
+    def get_categories(self, user_id):
+        """Return the names of the user's categories in alphabetical order"""
         cursor = self.conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS transactions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                amount REAL,
-                category TEXT,
-                description TEXT,
-                type TEXT,
-                date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                user_id INTEGER,
-                FOREIGN KEY (user_id) REFERENCES users(id)
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                password TEXT NOT NULL,
-                email TEXT UNIQUE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        self.conn.commit()
+        cursor.execute('SELECT name FROM categories WHERE user_id = ? ORDER BY name', (user_id,))
+        return [name for name, in cursor.fetchall()]
 
     def add_transaction(self, transaction, user_id):
         cursor = self.conn.cursor()
-        cursor.execute('''
-            INSERT INTO transactions (amount, category, description, type, user_id)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (transaction.amount, transaction.category, transaction.description, transaction.type, user_id))
-        self.conn.commit()    
+        try:
+            category_id = self._category_id(cursor, user_id, transaction.category)
+            cursor.execute('''
+                INSERT INTO transactions (amount, category_id, description, type, date, user_id)
+                VALUES (?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP), ?)
+            ''', (transaction.amount, category_id, transaction.description, transaction.type, transaction.date, user_id))
+            self._bump_data_version(cursor, user_id)
+            self.conn.commit()
+        except Exception:
+            self._rollback()
+            raise
+        report_cache.invalidate(user_id)
+
+    def last_transaction_id(self):
+        """The highest transaction id so far; every row added later gets a larger one"""
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT IFNULL(MAX(id), 0) FROM transactions')
+        return cursor.fetchone()[0]
+
+    def add_transactions(self, transactions, user_id, existing_until=None):
+        """Insert many transactions in a single database transaction.
+
+        Rows matching a transaction that already existed (same date, amount,
+        type and description, with an id up to `existing_until`, by default
+        the last one before this call) are skipped, so identical rows within
+        the batch are all kept. Rows with an external_id are skipped when the
+        user already has a row with that id, and otherwise only match existing
+        rows that have none. Returns the number of rows inserted.
+        """
+        transactions = list(transactions)
+        cursor = self.conn.cursor()
+        # Take the write lock up front so the batch never waits half-way through
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            if existing_until is None:
+                existing_until = self.last_transaction_id()
+            category_ids = {name: self._category_id(cursor, user_id, name) for name in {t.category for t in transactions}}
+            cursor.executemany('''
+                INSERT INTO transactions (amount, category_id, description, type, date, user_id, external_id)
+                SELECT ?1, ?2, ?3, ?4, COALESCE(?5, CURRENT_TIMESTAMP), ?6, ?7
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM transactions
+                    WHERE user_id = ?6 AND date = ?5 AND amount = ?1 AND type = ?4 AND description IS ?3
+                    AND id <= ?8 AND (?7 IS NULL OR external_id IS NULL)
+                )
+                ON CONFLICT DO NOTHING
+            ''', ((t.amount, category_ids[t.category], t.description, t.type, t.date, user_id, t.external_id, existing_until)
+                  for t in transactions))
+            inserted = cursor.rowcount
+            if inserted:
+                self._bump_data_version(cursor, user_id)
+            self.conn.commit()
+        except Exception:
+            self._rollback()
+            raise
+        if inserted:
+            report_cache.invalidate(user_id)
+        return inserted
 
     def get_all_transactions(self, user_id):
         cursor = self.conn.cursor()
-        cursor.execute('SELECT * FROM transactions WHERE user_id = ?', (user_id,))
-        rows = cursor.fetchall()
-        transactions = []
-        for row in rows:
-            # Create a Transaction object with amount, category, description, type, date
-            transaction = Transaction(row[1], row[2], row[3], row[4], row[5])
-            transactions.append(transaction)
-        return transactions
+        cursor.row_factory = Transaction.row_factory
+        cursor.execute(f'SELECT {TRANSACTION_COLUMNS} FROM {TRANSACTION_SOURCE} WHERE t.user_id = ?', (user_id,))
+        return cursor.fetchall()
+
+    def get_transaction_batch(self, user_id, chunk_size=10000):
+        """Load the user's transactions into a columnar TransactionBatch"""
+        batch = TransactionBatch()
+        cursor = self.conn.cursor()
+        cursor.execute(f'SELECT {TRANSACTION_COLUMNS} FROM {TRANSACTION_SOURCE} WHERE t.user_id = ? ORDER BY t.date, t.id', (user_id,))
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            batch.extend(rows)
+        return batch
+
+    def search_transactions(self, user_id, query, limit=50):
+        """Return the user's transactions whose description or category match every word of query.
+
+        Words match as prefixes, so "groc" finds "Groceries". Results come
+        newest-added first: FTS5 hands out rowids in that order, so the scan
+        stops as soon as `limit` matches are found.
+        """
+        terms = [word.replace('"', '') for word in query.split()]
+        match = ' '.join(f'"{term}"*' for term in terms if term)
+        if not match:
+            return []
+        cursor = self.conn.cursor()
+        cursor.row_factory = Transaction.row_factory
+        cursor.execute(f'''
+            SELECT {TRANSACTION_COLUMNS}
+            FROM transactions_fts f CROSS JOIN transactions t ON t.id = f.rowid
+            LEFT JOIN categories c ON c.id = t.category_id
+            WHERE transactions_fts MATCH ? AND t.user_id = ?
+            ORDER BY f.rowid DESC
+            LIMIT ?
+        ''', (match, user_id, limit))
+        return cursor.fetchall()
+
+    def count_transactions(self, user_id):
+        """Number of the user's transactions, from the per-month summary rows rather than a scan of the history"""
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT IFNULL(SUM(count), 0) FROM transaction_summary WHERE user_id = ?', (user_id,))
+        return cursor.fetchone()[0]
+
+    def iter_transactions(self, user_id, after=None, limit=100, order='desc', offset=0):
+        """Return one page of transactions ordered by (date, id).
+
+        Pass the (date, id) of the last transaction of a page as `after` to get
+        the next one; the seek is served by idx_transactions_user_date. `offset`
+        is only meant for jumping to a page with no known predecessor.
+        """
+        if order not in ('asc', 'desc'):
+            raise ValueError("order must be 'asc' or 'desc'")
+        comparison = '<' if order == 'desc' else '>'
+        sql = f'SELECT {TRANSACTION_COLUMNS} FROM {TRANSACTION_SOURCE} WHERE t.user_id = ?'
+        params = [user_id]
+        if after is not None:
+            sql += f' AND (t.date, t.id) {comparison} (?, ?)'
+            params.extend(after)
+        sql += f' ORDER BY t.date {order.upper()}, t.id {order.upper()} LIMIT ? OFFSET ?'
+        params.extend((limit, offset))
+        cursor = self.conn.cursor()
+        cursor.row_factory = Transaction.row_factory
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+    def stream_transactions(self, user_id, start_date=None, end_date=None, category=None, chunk_size=1000):
+        """Yield (date, type, amount, category, description) rows in chunks, for export.
+
+        Rows are read from the cursor with fetchmany, so only one chunk is held
+        in memory. Amounts come formatted as decimal text ('12.50') by SQLite.
+        Dates are inclusive 'YYYY-MM-DD' strings; anything else raises
+        ValueError right away rather than on the first chunk.
+        """
+        from datetime import date
+        bounds = []
+        for name, value in (('start', start_date), ('end', end_date)):
+            try:
+                bounds.append(date.fromisoformat(value).isoformat() if value else None)
+            except ValueError:
+                raise ValueError(f"invalid {name} date {value!r}, expected YYYY-MM-DD") from None
+        start_date, end_date = bounds
+
+        sql = f"SELECT t.date, t.type, {amount_sql('t.amount')}, c.name, t.description FROM {TRANSACTION_SOURCE} WHERE t.user_id = ?"
+        params = [user_id]
+        if start_date:
+            sql += ' AND t.date >= ?'
+            params.append(start_date)
+        if end_date:
+            sql += " AND t.date < date(?, '+1 day')"
+            params.append(end_date)
+        if category:
+            sql += ' AND t.category_id = (SELECT id FROM categories WHERE user_id = ? AND name = ?)'
+            params.extend((user_id, category))
+        sql += ' ORDER BY t.date, t.id'
+        cursor = self.conn.cursor()
+        cursor.execute(sql, params)
+
+        def chunks():
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+        return chunks()
+
+    def get_recent_transactions(self, user_id, limit=5):
+        cursor = self.conn.cursor()
+        cursor.row_factory = Transaction.row_factory
+        cursor.execute(f'''
+            SELECT {TRANSACTION_COLUMNS} FROM {TRANSACTION_SOURCE} WHERE t.user_id = ?
+            ORDER BY t.date DESC, t.id DESC LIMIT ?
+        ''', (user_id, limit))
+        return cursor.fetchall()
+
+    def get_category_totals(self, user_id):
+        """Return (type, category, total) rows from the monthly summary table"""
+        # Grouped on the integer id; the name follows from it
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT s.type, c.name, SUM(s.total) FROM transaction_summary s
+            LEFT JOIN categories c ON c.id = s.category_id
+            WHERE s.user_id = ?
+            GROUP BY s.type, s.category_id
+        ''', (user_id,))
+        return cursor.fetchall()
+
+    def get_period_totals(self, user_id, period):
+        """Return (bucket, type, category, total) rows grouped by day, week, month or year"""
+        if period in ('monthly', 'yearly'):
+            # Whole months are already summed in the summary table
+            bucket = 'month' if period == 'monthly' else 'substr(month, 1, 4)'
+            totals = f'''
+                SELECT {bucket} AS bucket, type, category_id, SUM(total) AS total FROM transaction_summary
+                WHERE user_id = ? AND month != ''
+                GROUP BY 1, 2, 3
+            '''
+        elif period in ('daily', 'weekly'):
+            bucket = 'date(date)' if period == 'daily' else "date(date, 'weekday 0', '-6 days')"
+            totals = f'''
+                SELECT {bucket} AS bucket, type, category_id, SUM(amount) AS total FROM transactions
+                WHERE user_id = ? AND date IS NOT NULL
+                GROUP BY 1, 2, 3
+            '''
+        else:
+            raise ValueError(f"Unknown period: {period}")
+        cursor = self.conn.cursor()
+        cursor.execute(f'''
+            SELECT s.bucket, s.type, c.name, s.total FROM ({totals}) s
+            LEFT JOIN categories c ON c.id = s.category_id
+            ORDER BY 1
+        ''', (user_id,))
+        return cursor.fetchall()
+
+    def rebuild_summary(self, user_id=None):
+        """Recompute the summary table for one user, or for everyone"""
+        cursor = self.conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            rebuild_transaction_summary(cursor, user_id)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+
+    def verify_summary(self, user_id=None):
+        """Return (user_id, month, type, category_id, expected, stored) for every summary row that drifted"""
+        key = summary_key('t.')
+        where = '' if user_id is None else 'WHERE t.user_id = ?'
+        cursor = self.conn.cursor()
+        cursor.execute(f'''
+            WITH actual AS (
+                SELECT t.user_id, {key['month']} AS month, {key['type']} AS type, {key['category_id']} AS category_id,
+                       SUM(IFNULL(t.amount, 0)) AS total, COUNT(*) AS count
+                FROM transactions t {where}
+                GROUP BY 1, 2, 3, 4
+            ),
+            stored AS (
+                SELECT * FROM transaction_summary {'' if user_id is None else 'WHERE user_id = ?'}
+            )
+            SELECT a.user_id, a.month, a.type, a.category_id, a.total, s.total
+            FROM actual a LEFT JOIN stored s
+                ON s.user_id IS a.user_id AND s.month = a.month AND s.type = a.type AND s.category_id = a.category_id
+            WHERE s.total IS NULL OR s.count != a.count OR s.total != a.total
+            UNION ALL
+            SELECT s.user_id, s.month, s.type, s.category_id, NULL, s.total
+            FROM stored s LEFT JOIN actual a
+                ON a.user_id IS s.user_id AND a.month = s.month AND a.type = s.type AND a.category_id = s.category_id
+            WHERE a.count IS NULL
+        ''', () if user_id is None else (user_id, user_id))
+        return cursor.fetchall()
 
     def clear_transactions(self, user_id):
         cursor = self.conn.cursor()
         cursor.execute('DELETE FROM transactions WHERE user_id = ?', (user_id,))
+        self._bump_data_version(cursor, user_id)
         self.conn.commit()
+        report_cache.invalidate(user_id)
         print("All transactions have been deleted.")
 
+    def _bump_data_version(self, cursor, user_id):
+        # Runs inside the caller's transaction so the version moves with the data
+        cursor.execute('''
+            INSERT INTO data_versions (user_id, version) VALUES (?, 1)
+            ON CONFLICT (user_id) DO UPDATE SET version = version + 1
+        ''', (user_id,))
+
+    def get_data_version(self, user_id):
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT version FROM data_versions WHERE user_id = ?', (user_id,))
+        row = cursor.fetchone()
+        return row[0] if row else 0
+
+    def set_budget(self, user_id, category, amount, period='monthly'):
+        """Create or update a budget; a new budget's spend is seeded from the history once"""
+        cursor = self.conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            category_id = self._category_id(cursor, user_id, category)
+            cursor.execute('''
+                UPDATE budgets SET amount = ? WHERE user_id = ? AND category_id = ? AND period = ?
+            ''', (amount, user_id, category_id, period))
+            if cursor.rowcount == 0:
+                cursor.execute('''
+                    INSERT INTO budgets (user_id, category_id, period, amount) VALUES (?, ?, ?, ?)
+                ''', (user_id, category_id, period, amount))
+                cursor.execute(f'''
+                    INSERT INTO budget_spend (budget_id, period_start, spent)
+                    SELECT ?, {budget_period_start('?', 'date')}, SUM(amount) FROM transactions
+                    WHERE user_id = ? AND type = 'expense' AND category_id = ?
+                    GROUP BY 2
+                ''', (cursor.lastrowid, period, user_id, category_id))
+            self.conn.commit()
+        except Exception:
+            self._rollback()
+            raise
+
+    def delete_budget(self, user_id, category, period='monthly'):
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            DELETE FROM budgets
+            WHERE user_id = ? AND category_id = (SELECT id FROM categories WHERE user_id = ? AND name = ?) AND period = ?
+        ''', (user_id, user_id, category, period))
+        self.conn.commit()
+
+    def get_budget_status(self, user_id, category=None):
+        """Return (category, period, amount, spent) for the user's budgets in the current window"""
+        sql = f'''
+            SELECT c.name, b.period, b.amount, IFNULL(s.spent, 0)
+            FROM budgets b
+            JOIN categories c ON c.id = b.category_id
+            LEFT JOIN budget_spend s
+                ON s.budget_id = b.id AND s.period_start = {budget_period_start('b.period', "'now'")}
+            WHERE b.user_id = ?
+        '''
+        params = [user_id]
+        if category is not None:
+            sql += ' AND c.name = ?'
+            params.append(category)
+        cursor = self.conn.cursor()
+        cursor.execute(sql + ' ORDER BY c.name, b.period', params)
+        return cursor.fetchall()
+
+    def add_recurring_rule(self, user_id, transaction, schedule, start_date, end_date=None):
+        """Store a recurring transaction and return the rule's id; dates are 'YYYY-MM-DD' strings"""
+        from recurring import parse_schedule
+        from datetime import date
+        parse_schedule(schedule)
+        start_date = date.fromisoformat(start_date).isoformat()
+        end_date = date.fromisoformat(end_date).isoformat() if end_date else None
+        if end_date is not None and end_date < start_date:
+            raise ValueError("end date is before the start date")
+        cursor = self.conn.cursor()
+        try:
+            category_id = self._category_id(cursor, user_id, transaction.category)
+            cursor.execute('''
+                INSERT INTO recurring_rules (user_id, amount, category_id, description, type, schedule, start_date, end_date)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (user_id, transaction.amount, category_id, transaction.description, transaction.type,
+                  schedule.strip().lower(), start_date, end_date))
+            self.conn.commit()
+        except Exception:
+            self._rollback()
+            raise
+        return cursor.lastrowid
+
+    def get_recurring_rules(self, user_id):
+        """Return (id, transaction, schedule, start_date, end_date, last_run) for each of the user's rules"""
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT r.id, r.amount, c.name, r.description, r.type, r.schedule, r.start_date, r.end_date, r.last_run
+            FROM recurring_rules r LEFT JOIN categories c ON c.id = r.category_id
+            WHERE r.user_id = ?
+            ORDER BY r.id
+        ''', (user_id,))
+        return [(rule_id, Transaction(amount, category, description, type), schedule, start_date, end_date, last_run)
+                for rule_id, amount, category, description, type, schedule, start_date, end_date, last_run in cursor]
+
+    def delete_recurring_rule(self, user_id, rule_id):
+        """Delete a rule; transactions it already created are kept. Returns False if there was no such rule"""
+        cursor = self.conn.cursor()
+        cursor.execute('DELETE FROM recurring_rules WHERE id = ? AND user_id = ?', (rule_id, user_id))
+        self.conn.commit()
+        return cursor.rowcount > 0
+
+    def materialize_recurring(self, user_id=None, today=None):
+        """Insert every occurrence of the recurring rules that fell due since their last run.
+
+        All rules, for one user or for everyone, catch up in a single
+        transaction with one batched insert. The unique (rule_id, date) index
+        makes running twice harmless. Returns the number of transactions added.
+        """
+        from datetime import date
+        from recurring import occurrences
+        from importer import DATE_FORMAT
+        today = today or date.today()
+        cursor = self.conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            cursor.execute(f'''
+                SELECT id, user_id, amount, category_id, description, type, schedule, start_date, end_date, last_run
+                FROM recurring_rules
+                WHERE start_date <= ? AND (last_run IS NULL OR last_run < MIN(?, IFNULL(end_date, ?)))
+                {'' if user_id is None else 'AND user_id = ?'}
+            ''', (today.isoformat(),) * 3 + (() if user_id is None else (user_id,)))
+            rows = []
+            runs = []
+            for rule_id, owner, amount, category_id, description, type, schedule, start_date, end_date, last_run in cursor.fetchall():
+                until = min(today, date.fromisoformat(end_date)) if end_date else today
+                after = date.fromisoformat(last_run) if last_run else None
+                # Midnight, in the same format as CURRENT_TIMESTAMP and imported dates
+                rows.extend((amount, category_id, description, type, day.strftime(DATE_FORMAT), owner, rule_id)
+                            for day in occurrences(schedule, date.fromisoformat(start_date), until, after))
+                runs.append((until.isoformat(), rule_id))
+            inserted = 0
+            if rows:
+                cursor.executemany('''
+                    INSERT OR IGNORE INTO transactions (amount, category_id, description, type, date, user_id, rule_id)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', rows)
+                inserted = cursor.rowcount
+            cursor.executemany('UPDATE recurring_rules SET last_run = ? WHERE id = ?', runs)
+            owners = {row[5] for row in rows}
+            if inserted:
+                for owner in owners:
+                    self._bump_data_version(cursor, owner)
+            self.conn.commit()
+        except Exception:
+            self._rollback()
+            raise
+        if inserted:
+            for owner in owners:
+                report_cache.invalidate(owner)
+        return inserted
+
     def add_user(self, username, password, email=None):
+        # Imported on first use; hashlib is not needed until someone logs in
+        from passwords import hash_password
         cursor = self.conn.cursor()
         try:
             cursor.execute('''
                 INSERT INTO users (username, password, email)
                 VALUES (?, ?, ?)
-            ''', (username, password, email))
+            ''', (username, hash_password(password), email))
             self.conn.commit()
             return True
         except sqlite3.IntegrityError:
+            self.conn.rollback()
             return False  # Username or email already exists
 
     def get_user_by_username(self, username):
         cursor = self.conn.cursor()
-        cursor.execute('SELECT * FROM users WHERE username = ?', (username,))
+        cursor.execute(f'SELECT {USER_COLUMNS} FROM users WHERE username = ?', (username,))
         user_row = cursor.fetchone()
         return User.from_db_row(user_row) if user_row else None
 
+    def get_all_users(self):
+        cursor = self.conn.cursor()
+        cursor.execute(f'SELECT {USER_COLUMNS} FROM users ORDER BY id')
+        return [User.from_db_row(row) for row in cursor.fetchall()]
+
     def authenticate_user(self, username, password):
+        """Return the User if the password matches, upgrading its hash to the current parameters"""
+        from passwords import hash_password, verify_password, needs_rehash, auth_cache
+        user_row = auth_cache.get(self.path, username, password)
+        if user_row:
+            return User.from_db_row(user_row)
+
         cursor = self.conn.cursor()
-        cursor.execute('SELECT * FROM users WHERE username = ? AND password = ?', (username, password))
+        cursor.execute(f'SELECT {USER_COLUMNS} FROM users WHERE username = ?', (username,))
         user_row = cursor.fetchone()
-        return User.from_db_row(user_row) if user_row else None
+        if not user_row or not verify_password(password, user_row[2]):
+            return None
+        if needs_rehash(user_row[2]) and not self.readonly:
+            password_hash = hash_password(password)
+            cursor.execute('UPDATE users SET password = ? WHERE id = ?', (password_hash, user_row[0]))
+            self.conn.commit()
+            user_row = (user_row[0], user_row[1], password_hash, *user_row[3:])
+        auth_cache.put(self.path, username, password, user_row)
+        return User.from_db_row(user_row)
+
+    def create_session(self, user_id, ttl=None):
+        """Start a session for the user and return (token, expires_at as Unix time).
+
+        The token is only ever stored as a hash. Sessions of the user that
+        have already expired are cleared out at the same time.
+        """
+        import time
+        from sessions import new_token, token_hash
+        if ttl is None:
+            ttl = load_config()['SESSION_TTL']
+        token = new_token()
+        now = int(time.time())
+        expires_at = now + int(ttl)
+        cursor = self.conn.cursor()
+        cursor.execute('DELETE FROM sessions WHERE user_id = ? AND expires_at <= ?', (user_id, now))
+        cursor.execute('INSERT INTO sessions (token_hash, user_id, expires_at) VALUES (?, ?, ?)',
+                       (token_hash(token), user_id, expires_at))
+        self.conn.commit()
+        return token, expires_at
+
+    def get_session_user(self, token):
+        """Return the User a live session token belongs to, or None; recent tokens are checked in memory"""
+        import time
+        from sessions import token_hash, session_cache
+        key = token_hash(token)
+        user_row = session_cache.get(self.path, key)
+        if user_row:
+            return User.from_db_row(user_row)
+
+        columns = ', '.join('u.' + column for column in USER_COLUMNS.split(', '))
+        cursor = self.conn.cursor()
+        cursor.execute(f'''
+            SELECT {columns}, s.expires_at FROM sessions s JOIN users u ON u.id = s.user_id
+            WHERE s.token_hash = ? AND s.expires_at > ?
+        ''', (key, int(time.time())))
+        row = cursor.fetchone()
+        if not row:
+            return None
+        session_cache.put(self.path, key, row[:-1], row[-1])
+        return User.from_db_row(row[:-1])
+
+    def end_session(self, token):
+        """Log the session out; returns False if there was no such session"""
+        from sessions import token_hash, session_cache
+        key = token_hash(token)
+        session_cache.invalidate(self.path, key)
+        cursor = self.conn.cursor()
+        cursor.execute('DELETE FROM sessions WHERE token_hash = ?', (key,))
+        self.conn.commit()
+        return cursor.rowcount > 0
+
+    def explain_hot_queries(self):
+        """Map each hot query to its plan and whether every table is reached through an index"""
+        report = {}
+        for name, (sql, params) in HOT_QUERIES.items():
+            plan = explain_query_plan(self.conn, sql, params)
+            # A plain SCAN walks a whole table; FTS5 lookups show as SCAN ... VIRTUAL TABLE
+            uses_index = not any(line.startswith('SCAN') and 'VIRTUAL TABLE' not in line for line in plan)
+            report[name] = (uses_index, plan)
+        return report
+
+    def close(self):
+        if getattr(self, '_conn', None) is not None:
+            self._conn.close()
+            self._conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
     def __del__(self):
-        self.conn.close()
+        self.close()
+
+
+# Time every public method; see metrics.py
+instrument_class(Database, 'db')
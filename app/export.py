@@ -1,16 +1,86 @@
 import csv
-from report import generate_report
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
 
-def export_report_to_csv(db, currency_symbol, user_id, filename='financial_report.csv'):
-    # Pass db, currency_symbol, and user_id to generate_report
-    transactions, total_income, total_expenses, net_savings, category_expenses = generate_report(db, currency_symbol, user_id, return_data=True)
+# Columns of the rows stream_transactions returns
+CSV_HEADER = ['Date', 'Type', 'Amount', 'Category', 'Description']
 
-    with open(filename, 'w', newline='') as csvfile:
-        fieldnames = ['Date', 'Type', 'Amount', 'Category', 'Description']
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+def export_report_to_csv(db, currency_symbol, user_id, filename='financial_report.csv',
+                         start_date=None, end_date=None, category=None, progress=None, chunk_size=1000):
+    """Stream the user's transactions to a CSV file and return the number of rows written.
 
-        writer.writeheader()
-        for t in transactions:
-            writer.writerow({'Date': t.date, 'Type': t.type, 'Amount': t.amount, 'Category': t.category, 'Description': t.description})
+    `progress`, if given, is called with the running row count after each chunk.
+    The file is written under a temporary name and renamed into place, so
+    readers never see a half-written export.
+    """
+    rows_written = 0
+    # Same directory, so the rename cannot cross file systems; a unique name
+    # per call, since two exports to one file may overlap (GUI worker threads).
+    # mkstemp creates it readable by the owner only, which suits financial data.
+    fd, temp_name = tempfile.mkstemp(prefix=os.path.basename(filename) + '.', suffix='.tmp',
+                                     dir=os.path.dirname(filename) or '.')
+    try:
+        with open(fd, 'w', newline='') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(CSV_HEADER)
 
-    print(f"Report exported to {filename}")
+            for rows in db.stream_transactions(user_id, start_date, end_date, category, chunk_size):
+                writer.writerows(rows)
+                rows_written += len(rows)
+                if progress:
+                    progress(rows_written)
+        os.replace(temp_name, filename)
+    except BaseException:
+        if os.path.exists(temp_name):
+            os.unlink(temp_name)
+        raise
+
+    return rows_written
+
+
+# Read-only connection of the current export worker process
+_worker_db = None
+
+def _init_export_worker(path):
+    global _worker_db
+    from database import Database
+    _worker_db = Database(path, readonly=True)
+
+def _export_shard(shard, currency_symbol, options):
+    """Export every (user_id, filename) in the shard; return this worker's stats and results"""
+    start = time.perf_counter()
+    results = []
+    for user_id, filename in shard:
+        results.append((user_id, filename, export_report_to_csv(_worker_db, currency_symbol, user_id, filename, **options)))
+    return os.getpid(), time.perf_counter() - start, results
+
+def export_users_parallel(db_path, currency_symbol, jobs, workers=None, shards_per_worker=4, **options):
+    """Export many users at once with a pool of processes.
+
+    `jobs` is a list of (user_id, filename). Users are dealt round-robin into
+    shards, a few per worker so a slow shard does not hold up the rest. Each
+    worker opens its own read-only connection. Returns (results, worker_stats):
+    results are (user_id, filename, rows) in job order, and worker_stats maps
+    each worker's pid to its users, rows and busy seconds.
+    """
+    workers = workers or os.cpu_count() or 1
+    shard_count = max(1, min(len(jobs), workers * shards_per_worker))
+    shards = [jobs[i::shard_count] for i in range(shard_count)]
+
+    results = []
+    worker_stats = {}
+    with ProcessPoolExecutor(workers, initializer=_init_export_worker, initargs=(db_path,)) as pool:
+        futures = [pool.submit(_export_shard, shard, currency_symbol, options) for shard in shards if shard]
+        for future in futures:
+            pid, seconds, shard_results = future.result()
+            stats = worker_stats.setdefault(pid, {'users': 0, 'rows': 0, 'seconds': 0.0})
+            stats['users'] += len(shard_results)
+            stats['rows'] += sum(rows for _, _, rows in shard_results)
+            stats['seconds'] += seconds
+            results.extend(shard_results)
+    # Back into the order the jobs were given in
+    order = {job: i for i, job in enumerate(jobs)}
+    results.sort(key=lambda result: order[result[:2]])
+    return results, worker_stats
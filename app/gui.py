@@ -1,5 +1,5 @@
 import tkinter as tk
-from tkinter import ttk, messagebox, simpledialog
+from tkinter import ttk, messagebox, simpledialog, filedialog
 import sys
 import os
 from collections import defaultdict
@@ -10,8 +10,19 @@ from .database import Database
 from .transaction import Transaction
 from .user import User
 from .report import generate_report
-from .config import save_currency_symbol, load_currency_symbol
+from .money import to_minor, format_amount
+from .config import save_currency_symbol, load_currency_symbol, load_import_batch_size
 from .budget import Budget
+from .timeseries import TimeSeries, PERIODS
+from .widgets import VirtualTreeview
+from .worker import BackgroundWorker
+# Bare import so the GUI shares one registry with the modules under app/
+from metrics import instrument_class
+
+# Number of transactions fetched per page in the transactions view
+TRANSACTION_PAGE_SIZE = 100
+# Most search matches shown at once
+SEARCH_RESULT_LIMIT = 200
 
 class FinanceTrackerGUI:
     def __init__(self, root):
@@ -20,10 +31,13 @@ class FinanceTrackerGUI:
         self.root.geometry("800x600")
         self.root.minsize(800, 600)
         
-        # Initialize database
+        # Initialize database; slow queries run on the background worker
         self.db = Database()
+        self.worker = BackgroundWorker(self.root, Database)
         self.current_user = None
-        self.budget = None
+        # Token of the session opened at login, ended on logout
+        self.session_token = None
+        self.recurring_due = False
         self.transactions = []
         
         # Try to load currency symbol
@@ -79,18 +93,36 @@ class FinanceTrackerGUI:
         password_entry = ttk.Entry(frame, width=40, show="*")
         password_entry.pack(pady=(0, 10), fill="x")
         
-        def attempt_login():
-            username = username_entry.get()
-            password = password_entry.get()
-            user = self.db.authenticate_user(username, password)
+        def on_login(session):
+            user, token = session
+            if not login_window.winfo_exists():
+                return
+            login_btn.configure(state=tk.NORMAL, text="Login")
             if user:
                 messagebox.showinfo("Success", f"Welcome back, {user.username}!")
                 self.current_user = user
+                self.session_token = token
                 login_window.destroy()
                 self.initialize_main_app()
             else:
                 messagebox.showerror("Error", "Invalid username or password.")
         
+        def on_login_error(error):
+            if login_window.winfo_exists():
+                login_btn.configure(state=tk.NORMAL, text="Login")
+            messagebox.showerror("Error", f"Login failed: {str(error)}")
+        
+        def attempt_login():
+            username = username_entry.get()
+            password = password_entry.get()
+            
+            def login(db):
+                user = db.authenticate_user(username, password)
+                return (user, db.create_session(user.id)[0]) if user else (None, None)
+            
+            login_btn.configure(state=tk.DISABLED, text="Logging in...")
+            self.worker.submit("login", login, on_login, on_login_error)
+        
         login_btn = ttk.Button(frame, text="Login", command=attempt_login)
         login_btn.pack(pady=10)
         
@@ -130,14 +162,27 @@ class FinanceTrackerGUI:
                 messagebox.showerror("Error", "Username and password are required.")
                 return
             
-            success = self.db.add_user(username, password, email)
-            if success:
-                messagebox.showinfo("Success", "Account created successfully! Please login.")
-                signup_window.destroy()
-                self.show_login()
-            else:
-                messagebox.showerror("Error", "Username or email already exists. Please try again.")
-        
+            def on_signup(success):
+                if not signup_window.winfo_exists():
+                    return
+                signup_btn.configure(state=tk.NORMAL, text="Sign Up")
+                if success:
+                    messagebox.showinfo("Success", "Account created successfully! Please login.")
+                    signup_window.destroy()
+                    self.show_login()
+                else:
+                    messagebox.showerror("Error", "Username or email already exists. Please try again.")
+
+            def on_signup_error(error):
+                if signup_window.winfo_exists():
+                    signup_btn.configure(state=tk.NORMAL, text="Sign Up")
+                messagebox.showerror("Error", f"Sign up failed: {str(error)}")
+
+            # Hashing the password is deliberately slow, so it runs on the worker
+            signup_btn.configure(state=tk.DISABLED, text="Creating account...")
+            self.worker.submit("signup", lambda db: db.add_user(username, password, email),
+                               on_signup, on_signup_error)
+
         signup_btn = ttk.Button(frame, text="Sign Up", command=attempt_signup)
         signup_btn.pack(pady=10)
     
@@ -147,12 +192,13 @@ class FinanceTrackerGUI:
             self.currency_symbol = simpledialog.askstring("Currency", "Enter your preferred currency symbol:", parent=self.root) or '$'
             save_currency_symbol(self.currency_symbol)
         
-        self.budget = Budget(self.currency_symbol)
-        
         # Clear existing frames and create main app UI
         for widget in self.root.winfo_children():
             widget.destroy()
         
+        # Recurring transactions that fell due since the last login are
+        # added before the first dashboard is loaded
+        self.recurring_due = True
         self.create_main_interface()
     
     def create_main_interface(self):
@@ -173,6 +219,7 @@ class FinanceTrackerGUI:
             ("Manage Budget", self.show_budget),
             ("Clear Transactions", self.clear_transactions),
             ("Export to CSV", self.export_to_csv),
+            ("Import Transactions", self.import_transactions),
             ("Logout", self.logout)
         ]
         
@@ -180,6 +227,11 @@ class FinanceTrackerGUI:
             btn = ttk.Button(menu_frame, text=text, command=command, width=20)
             btn.pack(pady=5, padx=10)
         
+        # Status bar for background work that outlives the current view
+        self.status_var = tk.StringVar()
+        status_bar = ttk.Label(self.root, textvariable=self.status_var, anchor="w", padding=(10, 2))
+        status_bar.pack(side=tk.BOTTOM, fill=tk.X)
+        
         # Content frame
         self.content_frame = ttk.Frame(self.root, padding="20")
         self.content_frame.pack(side=tk.RIGHT, fill=tk.BOTH, expand=True)
@@ -192,19 +244,39 @@ class FinanceTrackerGUI:
         self.update_dashboard()
     
     def clear_content_frame(self):
+        # Results still in flight for the previous view are no longer wanted
+        self.worker.cancel("content")
+        self.worker.cancel("trends")
         for widget in self.content_frame.winfo_children():
             widget.destroy()
     
+    def show_loading(self, text="Loading..."):
+        loading_label = ttk.Label(self.content_frame, text=text, font=("Arial", 12))
+        loading_label.pack(pady=20)
+        return loading_label
+    
     def update_dashboard(self):
         self.clear_content_frame()
         
         dashboard_label = ttk.Label(self.content_frame, text="Dashboard", font=("Arial", 16, "bold"))
         dashboard_label.pack(pady=20)
         
-        # Get financial summary
-        try:
-            transactions, total_income, total_expenses, net_savings, category_expenses = generate_report(
-                self.db, self.currency_symbol, self.current_user.id, return_data=True)
+        loading_label = self.show_loading()
+        user_id = self.current_user.id
+        catch_up = self.recurring_due
+        
+        # Get financial summary and recent transactions on the worker
+        def load_dashboard(db):
+            if catch_up:
+                db.materialize_recurring(user_id)
+            report = generate_report(db, self.currency_symbol, user_id, return_data=True)
+            return report, db.get_recent_transactions(user_id, limit=5)
+        
+        def display_dashboard(data):
+            (total_income, total_expenses, net_savings, category_expenses), recent_transactions = data
+            # A load that was superseded before it ran leaves the catch-up for the next one
+            self.recurring_due = False
+            loading_label.destroy()
             
             # Create summary frame
             summary_frame = ttk.Frame(self.content_frame)
@@ -212,16 +284,16 @@ class FinanceTrackerGUI:
             
             # Display financial summary
             summary_text = (
-                f"Total Income: {self.currency_symbol}{total_income:.2f}\n"
-                f"Total Expenses: {self.currency_symbol}{total_expenses:.2f}\n"
-                f"Net Savings: {self.currency_symbol}{net_savings:.2f}"
+                f"Total Income: {format_amount(total_income, self.currency_symbol)}\n"
+                f"Total Expenses: {format_amount(total_expenses, self.currency_symbol)}\n"
+                f"Net Savings: {format_amount(net_savings, self.currency_symbol)}"
             )
             
             summary_label = ttk.Label(summary_frame, text=summary_text, font=("Arial", 12))
             summary_label.pack(pady=10)
             
             # Display recent transactions if any
-            if transactions:
+            if recent_transactions:
                 recent_label = ttk.Label(self.content_frame, text="Recent Transactions", font=("Arial", 14, "bold"))
                 recent_label.pack(pady=(20, 10))
                 
@@ -233,20 +305,41 @@ class FinanceTrackerGUI:
                     tree.heading(col, text=col)
                     tree.column(col, width=100)
                 
-                # Add transactions to the tree (most recent first, limit to 5)
-                for txn in sorted(transactions, key=lambda t: str(t.date) if t.date else "", reverse=True)[:5]:
+                # Add transactions to the tree (already most recent first)
+                for txn in recent_transactions:
                     tree.insert("", tk.END, values=(
                         txn.date,
                         txn.type.capitalize(),
-                        f"{self.currency_symbol}{txn.amount:.2f}",
+                        format_amount(txn.amount, self.currency_symbol),
                         txn.category,
                         txn.description
                     ))
                 
                 tree.pack(fill="both", expand=True, padx=10, pady=10)
-        except Exception as e:
-            error_label = ttk.Label(self.content_frame, text=f"Error loading dashboard: {str(e)}", font=("Arial", 12))
-            error_label.pack(pady=20)
+        
+        def show_error(e):
+            loading_label.configure(text=f"Error loading dashboard: {str(e)}")
+        
+        self.worker.submit("content", load_dashboard, display_dashboard, show_error)
+    
+    def create_category_combobox(self, parent, **options):
+        """An editable combobox that suggests the user's existing categories as they type"""
+        combo = ttk.Combobox(parent, **options)
+        categories = []
+        
+        def suggest(event=None):
+            typed = combo.get().lower()
+            combo.configure(values=[name for name in categories if name.lower().startswith(typed)])
+        
+        def on_loaded(names):
+            categories[:] = names
+            if combo.winfo_exists():
+                suggest()
+        
+        combo.bind("<KeyRelease>", suggest)
+        user_id = self.current_user.id
+        self.worker.submit("categories", lambda db: db.get_categories(user_id), on_loaded)
+        return combo
     
     def show_add_transaction(self):
         self.clear_content_frame()
@@ -282,7 +375,7 @@ class FinanceTrackerGUI:
         category_label = ttk.Label(form_frame, text="Category:")
         category_label.pack(anchor="w", pady=(10, 0))
         
-        category_entry = ttk.Entry(form_frame)
+        category_entry = self.create_category_combobox(form_frame)
         category_entry.pack(fill="x", pady=(0, 10))
         
         # Description
@@ -293,31 +386,14 @@ class FinanceTrackerGUI:
         desc_entry.pack(fill="x", pady=(0, 10))
         
         # Submit button
-        def submit_transaction():
-            try:
-                amount = float(amount_entry.get())
-                category = category_entry.get()
-                description = desc_entry.get()
-                txn_type = transaction_type.get()
-                
-                if amount <= 0:
-                    messagebox.showerror("Error", "Amount must be greater than zero.")
-                    return
-                
-                if not category:
-                    messagebox.showerror("Error", "Category is required.")
-                    return
-                
-                # Create transaction and add to database
-                transaction = Transaction(amount, category, description, txn_type)
-                self.db.add_transaction(transaction, self.current_user.id)
-                
-                # Check budget if it's an expense
-                if txn_type == "expense" and self.budget:
-                    self.budget.check_budget(category, amount)
-                
-                messagebox.showinfo("Success", f"Transaction added successfully! {self.currency_symbol}{amount:.2f}")
-                
+        def on_added(result):
+            transaction, alerts = result
+            messagebox.showinfo("Success", f"Transaction added successfully! {format_amount(transaction.amount, self.currency_symbol)}")
+            if alerts:
+                messagebox.showwarning("Budget", "\n".join(alerts))
+            
+            # The user may have moved to another view in the meantime
+            if form_frame.winfo_exists():
                 # Clear form
                 amount_entry.delete(0, tk.END)
                 category_entry.delete(0, tk.END)
@@ -325,11 +401,46 @@ class FinanceTrackerGUI:
                 
                 # Update dashboard
                 self.update_dashboard()
-            
+        
+        def on_add_error(e):
+            if form_frame.winfo_exists():
+                submit_btn.configure(state=tk.NORMAL)
+            messagebox.showerror("Error", f"Failed to add transaction: {str(e)}")
+        
+        def submit_transaction():
+            try:
+                amount = to_minor(amount_entry.get())
             except ValueError:
                 messagebox.showerror("Error", "Please enter a valid amount.")
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to add transaction: {str(e)}")
+                return
+            
+            category = category_entry.get()
+            description = desc_entry.get()
+            txn_type = transaction_type.get()
+            
+            if amount <= 0:
+                messagebox.showerror("Error", "Amount must be greater than zero.")
+                return
+            
+            if not category:
+                messagebox.showerror("Error", "Category is required.")
+                return
+            
+            # Create transaction and add to database on the worker
+            transaction = Transaction(amount, category, description, txn_type)
+            user_id = self.current_user.id
+            currency_symbol = self.currency_symbol
+            
+            def add(db):
+                db.add_transaction(transaction, user_id)
+                # Check budget if it's an expense; the period's running spend is a single lookup
+                alerts = []
+                if transaction.type == "expense":
+                    alerts = Budget(db, user_id, currency_symbol).check_budget(transaction.category)
+                return transaction, alerts
+            
+            submit_btn.configure(state=tk.DISABLED)
+            self.worker.submit("add_transaction", add, on_added, on_add_error)
         
         submit_btn = ttk.Button(form_frame, text="Add Transaction", command=submit_transaction)
         submit_btn.pack(pady=20)
@@ -340,37 +451,112 @@ class FinanceTrackerGUI:
         title = ttk.Label(self.content_frame, text="Transactions", font=("Arial", 16, "bold"))
         title.pack(pady=20)
         
-        # Get transactions from database
-        transactions = self.db.get_all_transactions(self.current_user.id)
+        # Search bar
+        search_frame = ttk.Frame(self.content_frame)
+        search_frame.pack(fill="x", padx=10)
+        search_entry = ttk.Entry(search_frame)
+        search_entry.pack(side=tk.LEFT, fill="x", expand=True, padx=(0, 5))
         
-        if not transactions:
-            no_txn_label = ttk.Label(self.content_frame, text="No transactions found.", font=("Arial", 12))
-            no_txn_label.pack(pady=20)
-            return
+        # Holds the full list or the search results
+        list_frame = ttk.Frame(self.content_frame)
+        list_frame.pack(fill=tk.BOTH, expand=True)
         
-        # Create treeview for transactions
+        user_id = self.current_user.id
         columns = ("Date", "Type", "Amount", "Category", "Description")
-        tree = ttk.Treeview(self.content_frame, columns=columns, show="headings")
-        
-        for col in columns:
-            tree.heading(col, text=col)
-            tree.column(col, width=100)
-        
-        # Add scrollbar
-        scrollbar = ttk.Scrollbar(self.content_frame, orient=tk.VERTICAL, command=tree.yview)
-        tree.configure(yscroll=scrollbar.set)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=10, pady=10)
         
-        # Add transactions to the tree (most recent first)
-        for txn in sorted(transactions, key=lambda t: str(t.date) if t.date else "", reverse=True):
-            tree.insert("", tk.END, values=(
+        def format_row(txn):
+            return (
                 txn.date,
                 txn.type.capitalize(),
-                f"{self.currency_symbol}{txn.amount:.2f}",
+                format_amount(txn.amount, self.currency_symbol),
                 txn.category,
                 txn.description
-            ))
+            )
+        
+        def show_loading():
+            for widget in list_frame.winfo_children():
+                widget.destroy()
+            loading_label = ttk.Label(list_frame, text="Loading...", font=("Arial", 12))
+            loading_label.pack(pady=20)
+            return loading_label
+        
+        def show_all():
+            loading_label = show_loading()
+            
+            def display_transactions(row_count):
+                if not row_count:
+                    loading_label.configure(text="No transactions found.")
+                    return
+                
+                # Pages are fetched on the worker as the list scrolls (most recent
+                # first). The page after a cached one is a keyset seek. A jump
+                # elsewhere has to skip rows, so it counts from whichever end of
+                # the history is nearer.
+                def fetch_page(page_index, previous, on_page, on_error):
+                    start = page_index * TRANSACTION_PAGE_SIZE
+                    if previous is not None:
+                        task = lambda db: db.iter_transactions(user_id, after=(previous.date, previous.id),
+                                                               limit=TRANSACTION_PAGE_SIZE)
+                    elif start < row_count // 2:
+                        task = lambda db: db.iter_transactions(user_id, limit=TRANSACTION_PAGE_SIZE, offset=start)
+                    else:
+                        stop = min(start + TRANSACTION_PAGE_SIZE, row_count)
+                        task = lambda db: db.iter_transactions(user_id, limit=stop - start, order='asc',
+                                                               offset=row_count - stop)[::-1]
+                    self.worker.submit("transaction_page", task, on_page, on_error)
+                
+                loading_label.destroy()
+                transaction_list = VirtualTreeview(list_frame, columns, row_count, fetch_page, format_row,
+                                                   page_size=TRANSACTION_PAGE_SIZE)
+                transaction_list.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+            
+            def show_error(e):
+                loading_label.configure(text=f"Error loading transactions: {str(e)}")
+            
+            # Counting a long history is the slow part, so it runs on the worker
+            self.worker.submit("content", lambda db: db.count_transactions(user_id), display_transactions, show_error)
+        
+        def search():
+            query = search_entry.get().strip()
+            if not query:
+                show_all()
+                return
+            loading_label = show_loading()
+            
+            def display_results(results):
+                if not results:
+                    loading_label.configure(text="No matching transactions found.")
+                    return
+                
+                loading_label.destroy()
+                tree = ttk.Treeview(list_frame, columns=columns, show="headings")
+                for col in columns:
+                    tree.heading(col, text=col)
+                    tree.column(col, width=100)
+                
+                scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=tree.yview)
+                tree.configure(yscroll=scrollbar.set)
+                scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+                tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=10, pady=10)
+                
+                for txn in results:
+                    tree.insert("", tk.END, values=format_row(txn))
+            
+            def show_error(e):
+                loading_label.configure(text=f"Error searching transactions: {str(e)}")
+            
+            self.worker.submit("content", lambda db: db.search_transactions(user_id, query, SEARCH_RESULT_LIMIT),
+                               display_results, show_error)
+        
+        def clear_search():
+            search_entry.delete(0, tk.END)
+            show_all()
+        
+        ttk.Button(search_frame, text="Search", command=search).pack(side=tk.LEFT, padx=(0, 5))
+        ttk.Button(search_frame, text="Clear", command=clear_search).pack(side=tk.LEFT)
+        search_entry.bind("<Return>", lambda event: search())
+        
+        show_all()
     
     def show_report(self):
         self.clear_content_frame()
@@ -378,19 +564,25 @@ class FinanceTrackerGUI:
         title = ttk.Label(self.content_frame, text="Financial Report", font=("Arial", 16, "bold"))
         title.pack(pady=20)
         
-        # Get report data
-        try:
-            transactions, total_income, total_expenses, net_savings, category_expenses = generate_report(
-                self.db, self.currency_symbol, self.current_user.id, return_data=True)
+        loading_label = self.show_loading()
+        user_id = self.current_user.id
+        
+        # Get report data on the worker
+        def load_report(db):
+            return generate_report(db, self.currency_symbol, user_id, return_data=True)
+        
+        def display_report(report):
+            total_income, total_expenses, net_savings, category_expenses = report
+            loading_label.destroy()
             
             # Summary frame
             summary_frame = ttk.LabelFrame(self.content_frame, text="Summary")
             summary_frame.pack(fill="x", padx=10, pady=10, ipady=5)
             
             # Display financial summary
-            ttk.Label(summary_frame, text=f"Total Income: {self.currency_symbol}{total_income:.2f}").pack(anchor="w", padx=10, pady=5)
-            ttk.Label(summary_frame, text=f"Total Expenses: {self.currency_symbol}{total_expenses:.2f}").pack(anchor="w", padx=10, pady=5)
-            ttk.Label(summary_frame, text=f"Net Savings: {self.currency_symbol}{net_savings:.2f}").pack(anchor="w", padx=10, pady=5)
+            ttk.Label(summary_frame, text=f"Total Income: {format_amount(total_income, self.currency_symbol)}").pack(anchor="w", padx=10, pady=5)
+            ttk.Label(summary_frame, text=f"Total Expenses: {format_amount(total_expenses, self.currency_symbol)}").pack(anchor="w", padx=10, pady=5)
+            ttk.Label(summary_frame, text=f"Net Savings: {format_amount(net_savings, self.currency_symbol)}").pack(anchor="w", padx=10, pady=5)
             
             # Category breakdown
             if category_expenses:
@@ -399,7 +591,7 @@ class FinanceTrackerGUI:
                 
                 # Create treeview for categories
                 columns = ("Category", "Amount", "Percentage")
-                tree = ttk.Treeview(category_frame, columns=columns, show="headings", height=10)
+                tree = ttk.Treeview(category_frame, columns=columns, show="headings", height=5)
                 
                 for col in columns:
                     tree.heading(col, text=col)
@@ -410,19 +602,74 @@ class FinanceTrackerGUI:
                     percentage = (amount / total_expenses * 100) if total_expenses > 0 else 0
                     tree.insert("", tk.END, values=(
                         category,
-                        f"{self.currency_symbol}{amount:.2f}",
+                        format_amount(amount, self.currency_symbol),
                         f"{percentage:.1f}%"
                     ))
                 
                 tree.pack(fill="both", expand=True, padx=10, pady=10)
             
+            self.create_trend_frame(user_id)
+            
             # Export button
             export_btn = ttk.Button(self.content_frame, text="Export to CSV", command=self.export_to_csv)
             export_btn.pack(pady=10)
-            
-        except Exception as e:
-            error_label = ttk.Label(self.content_frame, text=f"Error generating report: {str(e)}", font=("Arial", 12))
-            error_label.pack(pady=20)
+        
+        def show_error(e):
+            loading_label.configure(text=f"Error generating report: {str(e)}")
+        
+        self.worker.submit("content", load_report, display_report, show_error)
+    
+    def create_trend_frame(self, user_id):
+        trend_frame = ttk.LabelFrame(self.content_frame, text="Trends")
+        trend_frame.pack(fill="both", expand=True, padx=10, pady=10)
+        
+        period_var = tk.StringVar(value="monthly")
+        period_combo = ttk.Combobox(trend_frame, textvariable=period_var, values=PERIODS, state="readonly", width=12)
+        period_combo.pack(anchor="w", padx=10, pady=5)
+        
+        notebook = ttk.Notebook(trend_frame)
+        notebook.pack(fill="both", expand=True, padx=10, pady=5)
+        
+        rollup_columns = ("Period", "Income", "Expenses", "Net", "Balance")
+        rollup_tree = ttk.Treeview(notebook, columns=rollup_columns, show="headings", height=5)
+        for col in rollup_columns:
+            rollup_tree.heading(col, text=col)
+            rollup_tree.column(col, width=100)
+        notebook.add(rollup_tree, text="Totals")
+        
+        category_columns = ("Category", "Latest", "Change", "Average")
+        category_tree = ttk.Treeview(notebook, columns=category_columns, show="headings", height=5)
+        for col in category_columns:
+            category_tree.heading(col, text=col)
+            category_tree.column(col, width=100)
+        notebook.add(category_tree, text="Categories")
+        
+        def money(value):
+            return format_amount(value, self.currency_symbol)
+        
+        def display_trends(series):
+            rollup_tree.delete(*rollup_tree.get_children())
+            category_tree.delete(*category_tree.get_children())
+            # Most recent period first
+            for bucket, income, expenses, net, balance in reversed(series.rows()):
+                rollup_tree.insert("", tk.END, values=(bucket, money(income), money(expenses), money(net), money(balance)))
+            for category, latest, change, average in series.category_trends():
+                category_tree.insert("", tk.END, values=(
+                    category,
+                    money(latest),
+                    ('+' if change >= 0 else '') + format_amount(change) if change is not None else "",
+                    money(average)
+                ))
+        
+        def show_error(e):
+            messagebox.showerror("Error", f"Failed to load trends: {str(e)}")
+        
+        def load_trends(event=None):
+            period = period_var.get()
+            self.worker.submit("trends", lambda db: TimeSeries.load(db, user_id, period), display_trends, show_error)
+        
+        period_combo.bind("<<ComboboxSelected>>", load_trends)
+        load_trends()
     
     def show_budget(self):
         self.clear_content_frame()
@@ -435,99 +682,207 @@ class FinanceTrackerGUI:
         form_frame.pack(fill="x", padx=10, pady=10)
         
         ttk.Label(form_frame, text="Category:").grid(row=0, column=0, sticky="w", pady=5, padx=5)
-        category_entry = ttk.Entry(form_frame, width=30)
+        category_entry = self.create_category_combobox(form_frame, width=28)
         category_entry.grid(row=0, column=1, pady=5, padx=5)
         
         ttk.Label(form_frame, text="Budget Amount:").grid(row=1, column=0, sticky="w", pady=5, padx=5)
         amount_entry = ttk.Entry(form_frame, width=30)
         amount_entry.grid(row=1, column=1, pady=5, padx=5)
         
+        ttk.Label(form_frame, text="Period:").grid(row=2, column=0, sticky="w", pady=5, padx=5)
+        period_var = tk.StringVar(value="monthly")
+        period_combo = ttk.Combobox(form_frame, textvariable=period_var, values=Budget.PERIODS, state="readonly", width=28)
+        period_combo.grid(row=2, column=1, pady=5, padx=5)
+        
+        user_id = self.current_user.id
+        currency_symbol = self.currency_symbol
+        
+        def on_budget_set(result):
+            category, amount, period = result
+            messagebox.showinfo("Success", f"Budget set: {category} ({period}) - {format_amount(amount, currency_symbol)}")
+            if not form_frame.winfo_exists():
+                return
+            set_btn.configure(state=tk.NORMAL)
+            
+            # Clear entries
+            category_entry.delete(0, tk.END)
+            amount_entry.delete(0, tk.END)
+            
+            # Refresh budgets view
+            display_budgets()
+        
+        def on_set_error(e):
+            if form_frame.winfo_exists():
+                set_btn.configure(state=tk.NORMAL)
+            messagebox.showerror("Error", f"Failed to set budget: {str(e)}")
+        
         def set_budget():
             try:
-                category = category_entry.get()
-                amount = float(amount_entry.get())
-                
-                if not category:
-                    messagebox.showerror("Error", "Category is required.")
-                    return
-                
-                if amount <= 0:
-                    messagebox.showerror("Error", "Amount must be greater than zero.")
-                    return
-                
-                self.budget.set_budget(category, amount)
-                messagebox.showinfo("Success", f"Budget set: {category} - {self.currency_symbol}{amount:.2f}")
-                
-                # Clear entries
-                category_entry.delete(0, tk.END)
-                amount_entry.delete(0, tk.END)
-                
-                # Refresh budgets view
-                display_budgets()
-            
+                amount = to_minor(amount_entry.get())
             except ValueError:
                 messagebox.showerror("Error", "Please enter a valid amount.")
+                return
+            category = category_entry.get()
+            period = period_var.get()
+            
+            if not category:
+                messagebox.showerror("Error", "Category is required.")
+                return
+            
+            if amount <= 0:
+                messagebox.showerror("Error", "Amount must be greater than zero.")
+                return
+            
+            # set_budget waits for the write lock, so it runs on the worker
+            def save(db):
+                Budget(db, user_id, currency_symbol).set_budget(category, amount, period)
+                return category, amount, period
+            
+            set_btn.configure(state=tk.DISABLED)
+            self.worker.submit("set_budget", save, on_budget_set, on_set_error)
         
         set_btn = ttk.Button(form_frame, text="Set Budget", command=set_budget)
-        set_btn.grid(row=2, column=1, pady=10, padx=5, sticky="e")
+        set_btn.grid(row=3, column=1, pady=10, padx=5, sticky="e")
         
         # Budget display
         budget_frame = ttk.LabelFrame(self.content_frame, text="Current Budgets")
         budget_frame.pack(fill="both", expand=True, padx=10, pady=10)
         
         # Function to display budgets in the treeview
-        def display_budgets():
+        def show_budgets(budgets):
+            if not budget_frame.winfo_exists():
+                return
             # Clear existing items
             for widget in budget_frame.winfo_children():
                 widget.destroy()
             
-            if not self.budget.budgets:
+            if not budgets:
                 no_budget_label = ttk.Label(budget_frame, text="No budgets set yet.", font=("Arial", 12))
                 no_budget_label.pack(pady=20)
                 return
             
             # Create treeview for budgets
-            columns = ("Category", "Budget Amount")
+            columns = ("Category", "Period", "Budget Amount", "Spent", "Status")
             tree = ttk.Treeview(budget_frame, columns=columns, show="headings")
             
             for col in columns:
                 tree.heading(col, text=col)
-                tree.column(col, width=150)
+                tree.column(col, width=110)
             
             # Add budgets to the tree
-            for category, amount in self.budget.budgets.items():
+            for category, period, amount, spent, status in budgets:
                 tree.insert("", tk.END, values=(
                     category,
-                    f"{self.currency_symbol}{amount:.2f}"
+                    period.capitalize(),
+                    format_amount(amount, self.currency_symbol),
+                    format_amount(spent, self.currency_symbol),
+                    status.capitalize()
                 ))
             
             tree.pack(fill="both", expand=True, padx=10, pady=10)
         
+        def show_budgets_error(e):
+            messagebox.showerror("Error", f"Failed to load budgets: {str(e)}")
+        
+        def display_budgets():
+            # Every budget's status comes back from one query
+            self.worker.submit("content", lambda db: Budget(db, user_id, currency_symbol).evaluate_budgets(),
+                               show_budgets, show_budgets_error)
+        
         # Initial display of budgets
         display_budgets()
     
     def clear_transactions(self):
         if messagebox.askyesno("Confirm", "Are you sure you want to delete all transactions? This cannot be undone."):
-            self.db.clear_transactions(self.current_user.id)
-            messagebox.showinfo("Success", "All transactions have been deleted.")
-            self.update_dashboard()
+            user_id = self.current_user.id
+            
+            def on_cleared(_):
+                self.status_var.set("")
+                messagebox.showinfo("Success", "All transactions have been deleted.")
+                self.update_dashboard()
+            
+            def on_error(e):
+                self.status_var.set("")
+                messagebox.showerror("Error", f"Failed to delete transactions: {str(e)}")
+            
+            self.status_var.set("Deleting transactions...")
+            self.worker.submit("clear_transactions", lambda db: db.clear_transactions(user_id), on_cleared, on_error)
     
     def export_to_csv(self):
         from app.export import export_report_to_csv
-        try:
-            filename = f"financial_report_{self.current_user.username}_{datetime.now().strftime('%Y%m%d')}.csv"
-            export_report_to_csv(self.db, self.currency_symbol, self.current_user.id, filename)
+        filename = f"financial_report_{self.current_user.username}_{datetime.now().strftime('%Y%m%d')}.csv"
+        user_id = self.current_user.id
+        
+        def on_exported(_):
+            self.status_var.set("")
             messagebox.showinfo("Success", f"Report exported to {filename}")
-        except Exception as e:
+        
+        def on_error(e):
+            self.status_var.set("")
             messagebox.showerror("Error", f"Failed to export report: {str(e)}")
+        
+        def show_progress(rows_written):
+            self.worker.post(self.status_var.set, f"Exporting report to {filename}... {rows_written} rows")
+        
+        # A newer export request replaces one that has not finished yet
+        self.status_var.set(f"Exporting report to {filename}...")
+        self.worker.submit("export",
+                           lambda db: export_report_to_csv(db, self.currency_symbol, user_id, filename,
+                                                           progress=show_progress),
+                           on_exported, on_error)
+    
+    def import_transactions(self):
+        from app.importer import import_transactions
+        filename = filedialog.askopenfilename(
+            parent=self.root,
+            title="Import Transactions",
+            filetypes=[("Bank statements", "*.csv *.ofx *.qfx"), ("All files", "*.*")]
+        )
+        if not filename:
+            return
+        user_id = self.current_user.id
+        batch_size = load_import_batch_size()
+        
+        def show_progress(inserted, skipped):
+            self.worker.post(self.status_var.set, f"Importing... {inserted} added, {skipped} skipped")
+        
+        def on_imported(result):
+            inserted, skipped = result
+            self.status_var.set("")
+            messagebox.showinfo("Success", f"Import finished: {inserted} added, {skipped} already present.")
+            self.update_dashboard()
+        
+        def on_error(e):
+            self.status_var.set("")
+            messagebox.showerror("Error", f"Failed to import transactions: {str(e)}")
+        
+        self.status_var.set(f"Importing {os.path.basename(filename)}...")
+        self.worker.submit("import",
+                           lambda db: import_transactions(db, user_id, filename, batch_size, show_progress),
+                           on_imported, on_error)
     
     def logout(self):
+        self.worker.cancel("content")
+        if self.session_token:
+            token = self.session_token
+            self.worker.submit("logout", lambda db: db.end_session(token))
+            self.session_token = None
         self.current_user = None
-        self.budget = None
         self.create_auth_frame()
 
 
+# Time every handler on the Tk thread; the work they hand off is timed as worker.<key>
+instrument_class(FinanceTrackerGUI, 'gui')
+
+
 def start_gui():
     root = tk.Tk()
     app = FinanceTrackerGUI(root)
-    root.mainloop() 
\ No newline at end of file
+    try:
+        root.mainloop()
+    finally:
+        app.worker.shutdown()
+        # Closing the window logs out too
+        if app.session_token:
+            app.db.end_session(app.session_token)
+        app.db.close() 
\ No newline at end of file
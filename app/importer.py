@@ -0,0 +1,95 @@
+import csv
+import os
+import re
+from datetime import datetime
+from itertools import islice
+from transaction import Transaction
+from money import to_minor
+
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+OFX_EXTENSIONS = ('.ofx', '.qfx')
+OFX_TAG = re.compile(r'<(\w+)>([^<\r\n]*)')
+
+
+def normalize_date(value):
+    """Return a date in the format SQLite's CURRENT_TIMESTAMP uses, or None"""
+    value = (value or '').strip()
+    if not value:
+        return None
+    return datetime.fromisoformat(value).strftime(DATE_FORMAT)
+
+
+def _signed_transaction(amount, category, description, txn_type, date, external_id=None):
+    # Bank files often sign the amount instead of giving a type
+    if not txn_type:
+        txn_type = 'expense' if amount < 0 else 'income'
+    return Transaction(abs(amount), category, description, txn_type.lower(), date, external_id=external_id)
+
+
+def parse_csv(file):
+    """Yield Transactions from a CSV file with the same columns as the export"""
+    reader = csv.DictReader(file)
+    columns = {(name or '').strip().lower() for name in reader.fieldnames or ()}
+    if 'amount' not in columns:
+        raise ValueError("missing Amount column")
+    for row in reader:
+        row = {(key or '').strip().lower(): (value or '').strip() for key, value in row.items()}
+        yield _signed_transaction(
+            to_minor(row['amount']),
+            row.get('category') or 'Uncategorized',
+            row.get('description', ''),
+            row.get('type'),
+            normalize_date(row.get('date'))
+        )
+
+
+def parse_ofx(file):
+    """Yield Transactions from the <STMTTRN> blocks of an OFX/QFX statement"""
+    current = None
+    for line in file:
+        for tag, value in OFX_TAG.findall(line):
+            tag = tag.upper()
+            if tag == 'STMTTRN':
+                current = {}
+            elif current is not None:
+                current[tag] = value.strip()
+        if current is not None and '</STMTTRN>' in line.upper():
+            if not current.get('TRNAMT'):
+                raise ValueError("OFX transaction without TRNAMT")
+            # DTPOSTED looks like 20240131120000[-5:EST]
+            posted = current.get('DTPOSTED', '')[:14]
+            date = datetime.strptime(posted.ljust(14, '0'), '%Y%m%d%H%M%S').strftime(DATE_FORMAT) if posted else None
+            yield _signed_transaction(
+                to_minor(current['TRNAMT']),
+                'Uncategorized',
+                current.get('NAME') or current.get('MEMO', ''),
+                None,
+                date,
+                current.get('FITID') or None
+            )
+            current = None
+
+
+def import_transactions(db, user_id, filename, batch_size=1000, progress=None):
+    """Import a CSV or OFX file and return (inserted, skipped).
+
+    The file is parsed as a stream and written in batches of `batch_size`, one
+    database transaction per batch. Rows already in the database before the
+    import started are skipped; repeated rows within the file are all kept.
+    """
+    parser = parse_ofx if os.path.splitext(filename)[1].lower() in OFX_EXTENSIONS else parse_csv
+    inserted = 0
+    skipped = 0
+    existing_until = db.last_transaction_id()
+    with open(filename, newline='') as file:
+        transactions = parser(file)
+        while True:
+            batch = list(islice(transactions, batch_size))
+            if not batch:
+                break
+            added = db.add_transactions(batch, user_id, existing_until)
+            inserted += added
+            skipped += len(batch) - added
+            if progress:
+                progress(inserted, skipped)
+    return inserted, skipped
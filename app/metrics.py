@@ -0,0 +1,131 @@
+import json
+import threading
+import time
+from functools import wraps
+from types import FunctionType
+
+# Code flag marking generator functions (inspect.CO_GENERATOR, without importing inspect)
+CO_GENERATOR = 0x20
+LOGGER_NAME = 'finwise.metrics'
+
+# Upper bounds of the latency histogram buckets, in milliseconds
+BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000)
+
+
+class Metrics:
+    """Thread-safe call counters and latency histograms per operation"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.operations = {}
+
+    def record(self, name, elapsed_ms, error=False):
+        with self.lock:
+            op = self.operations.get(name)
+            if op is None:
+                op = self.operations[name] = {
+                    'count': 0, 'errors': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                    'buckets': [0] * (len(BUCKETS_MS) + 1),
+                }
+            op['count'] += 1
+            op['errors'] += error
+            op['total_ms'] += elapsed_ms
+            op['max_ms'] = max(op['max_ms'], elapsed_ms)
+            for i, bound in enumerate(BUCKETS_MS):
+                if elapsed_ms <= bound:
+                    op['buckets'][i] += 1
+                    break
+            else:
+                op['buckets'][-1] += 1
+
+    def snapshot(self):
+        with self.lock:
+            snapshot = {}
+            for name, op in sorted(self.operations.items()):
+                labels = [f'<={bound}ms' for bound in BUCKETS_MS] + [f'>{BUCKETS_MS[-1]}ms']
+                snapshot[name] = {
+                    'count': op['count'],
+                    'errors': op['errors'],
+                    'total_ms': round(op['total_ms'], 3),
+                    'mean_ms': round(op['total_ms'] / op['count'], 3),
+                    'max_ms': round(op['max_ms'], 3),
+                    'histogram': {label: n for label, n in zip(labels, op['buckets']) if n},
+                }
+            return snapshot
+
+    def reset(self):
+        with self.lock:
+            self.operations.clear()
+
+    def dump(self, filename):
+        with open(filename, 'w') as metrics_file:
+            json.dump(self.snapshot(), metrics_file, indent=2)
+
+    def format_table(self):
+        lines = [f"{'operation':<40}{'count':>8}{'errors':>8}{'mean ms':>10}{'max ms':>10}"]
+        for name, op in self.snapshot().items():
+            lines.append(f"{name:<40}{op['count']:>8}{op['errors']:>8}{op['mean_ms']:>10.2f}{op['max_ms']:>10.2f}")
+        return '\n'.join(lines)
+
+
+# Process-wide registry used by the database layer, the GUI and the CLI
+metrics = Metrics()
+
+
+def timed(name):
+    """Decorator recording each call's latency under `name`; generators are timed until exhausted"""
+    def decorator(func):
+        if func.__code__.co_flags & CO_GENERATOR:
+            @wraps(func)
+            def generator_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                error = False
+                try:
+                    yield from func(*args, **kwargs)
+                except Exception:
+                    error = True
+                    raise
+                finally:
+                    metrics.record(name, (time.perf_counter() - start) * 1000, error)
+            return generator_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            error = False
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                error = True
+                raise
+            finally:
+                metrics.record(name, (time.perf_counter() - start) * 1000, error)
+        return wrapper
+    return decorator
+
+
+def instrument_class(cls, prefix):
+    """Wrap every public method of cls with timed('<prefix>.<method>')"""
+    for name, attr in list(vars(cls).items()):
+        if name.startswith('_') or not isinstance(attr, FunctionType):
+            continue
+        setattr(cls, name, timed(f'{prefix}.{name}')(attr))
+    return cls
+
+
+def log_slow_query(sql, elapsed_ms, plan):
+    # logging is only imported once there is something to log
+    import logging
+    plan_text = '\n'.join(f'    {line}' for line in plan) if plan else '    (no plan)'
+    logging.getLogger(LOGGER_NAME).warning("Slow query (%.1f ms): %s\n%s", elapsed_ms, ' '.join(sql.split()), plan_text)
+
+
+def configure_logging(filename=None):
+    """Send slow-query warnings to a file instead of stderr"""
+    if filename:
+        import logging
+        logger = logging.getLogger(LOGGER_NAME)
+        handler = logging.FileHandler(filename)
+        handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        logger.addHandler(handler)
+        logger.propagate = False
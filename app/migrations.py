@@ -0,0 +1,569 @@
+# Schema migrations, tracked with PRAGMA user_version.
+# Pending migrations run once, in order, inside a single transaction.
+
+def create_base_tables(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            amount REAL,
+            category TEXT,
+            description TEXT,
+            type TEXT,
+            date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            user_id INTEGER,
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            email TEXT UNIQUE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+def add_transaction_indexes(cursor):
+    # Per-user history in date order (listing, paging, clearing)
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_transactions_user_date
+        ON transactions (user_id, date)
+    ''')
+    # Covering index for the report aggregation
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_transactions_user_type_category
+        ON transactions (user_id, type, category, amount)
+    ''')
+
+# Key of the transaction_summary row a transaction is counted in;
+# uncategorized transactions are counted under category_id 0
+SUMMARY_KEY = {
+    'month': "IFNULL(strftime('%Y-%m', {row}date), '')",
+    'type': "IFNULL({row}type, '')",
+    'category_id': "IFNULL({row}category_id, 0)",
+}
+
+# The key before categories moved into their own table; migrations 3 to 8 run against it
+TEXT_SUMMARY_KEY = {
+    'month': "IFNULL(strftime('%Y-%m', {row}date), '')",
+    'type': "IFNULL({row}type, '')",
+    'category': "IFNULL({row}category, '')",
+}
+
+def summary_key(row='', key=SUMMARY_KEY):
+    return {column: expression.format(row=row) for column, expression in key.items()}
+
+def add_transaction_summary(cursor):
+    # Running totals per user, month, type and category, kept current by triggers
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS transaction_summary (
+            user_id INTEGER,
+            month TEXT NOT NULL,
+            type TEXT NOT NULL,
+            category TEXT NOT NULL,
+            total REAL NOT NULL DEFAULT 0,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, month, type, category)
+        )
+    ''')
+
+    new = summary_key('NEW.', TEXT_SUMMARY_KEY)
+    old = summary_key('OLD.', TEXT_SUMMARY_KEY)
+    add_new = f'''
+        INSERT OR IGNORE INTO transaction_summary (user_id, month, type, category)
+        VALUES (NEW.user_id, {new['month']}, {new['type']}, {new['category']});
+        UPDATE transaction_summary
+        SET total = total + IFNULL(NEW.amount, 0), count = count + 1
+        WHERE user_id = NEW.user_id AND month = {new['month']} AND type = {new['type']} AND category = {new['category']};
+    '''
+    remove_old = f'''
+        UPDATE transaction_summary
+        SET total = total - IFNULL(OLD.amount, 0), count = count - 1
+        WHERE user_id = OLD.user_id AND month = {old['month']} AND type = {old['type']} AND category = {old['category']};
+        DELETE FROM transaction_summary
+        WHERE user_id = OLD.user_id AND month = {old['month']} AND type = {old['type']} AND category = {old['category']}
+        AND count <= 0;
+    '''
+    cursor.execute(f'CREATE TRIGGER IF NOT EXISTS transactions_summary_insert AFTER INSERT ON transactions BEGIN {add_new} END')
+    cursor.execute(f'CREATE TRIGGER IF NOT EXISTS transactions_summary_delete AFTER DELETE ON transactions BEGIN {remove_old} END')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS transactions_summary_update
+        AFTER UPDATE OF amount, category, type, date, user_id ON transactions
+        BEGIN {remove_old} {add_new} END
+    ''')
+
+    key = summary_key('', TEXT_SUMMARY_KEY)
+    cursor.execute(f'''
+        INSERT INTO transaction_summary (user_id, month, type, category, total, count)
+        SELECT user_id, {key['month']}, {key['type']}, {key['category']}, SUM(IFNULL(amount, 0)), COUNT(*)
+        FROM transactions
+        GROUP BY 1, 2, 3, 4
+    ''')
+
+def rebuild_transaction_summary(cursor, user_id=None):
+    """Recompute transaction_summary from the transactions table"""
+    key = summary_key()
+    where = '' if user_id is None else 'WHERE user_id = ?'
+    params = () if user_id is None else (user_id,)
+    cursor.execute(f'DELETE FROM transaction_summary {where}', params)
+    cursor.execute(f'''
+        INSERT INTO transaction_summary (user_id, month, type, category_id, total, count)
+        SELECT user_id, {key['month']}, {key['type']}, {key['category_id']}, SUM(IFNULL(amount, 0)), COUNT(*)
+        FROM transactions {where}
+        GROUP BY 1, 2, 3, 4
+    ''', params)
+
+# First day of the budget window a date falls in; weeks start on Monday
+BUDGET_PERIOD_START = (
+    "CASE {period} WHEN 'weekly' THEN date({date}, 'weekday 0', '-6 days') "
+    "ELSE date({date}, 'start of month') END"
+)
+
+def budget_period_start(period, date):
+    return BUDGET_PERIOD_START.format(period=period, date=date)
+
+def add_budgets(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS budgets (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            category TEXT NOT NULL,
+            period TEXT NOT NULL DEFAULT 'monthly' CHECK (period IN ('monthly', 'weekly')),
+            amount REAL NOT NULL,
+            UNIQUE (user_id, category, period),
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    ''')
+    # Running spend per budget and window, so checks never scan the history
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS budget_spend (
+            budget_id INTEGER NOT NULL,
+            period_start TEXT NOT NULL,
+            spent REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (budget_id, period_start),
+            FOREIGN KEY (budget_id) REFERENCES budgets(id) ON DELETE CASCADE
+        ) WITHOUT ROWID
+    ''')
+
+    def change_spend(row, sign):
+        start = budget_period_start('b.period', f'{row}.date')
+        return f'''
+            INSERT OR IGNORE INTO budget_spend (budget_id, period_start)
+            SELECT b.id, {start} FROM budgets b
+            WHERE b.user_id = {row}.user_id AND b.category = {row}.category AND {row}.type = 'expense';
+            UPDATE budget_spend SET spent = spent {sign} IFNULL({row}.amount, 0)
+            WHERE (budget_id, period_start) IN (
+                SELECT b.id, {start} FROM budgets b
+                WHERE b.user_id = {row}.user_id AND b.category = {row}.category AND {row}.type = 'expense'
+            );
+        '''
+
+    cursor.execute(f'CREATE TRIGGER IF NOT EXISTS transactions_budget_insert AFTER INSERT ON transactions BEGIN {change_spend("NEW", "+")} END')
+    cursor.execute(f'CREATE TRIGGER IF NOT EXISTS transactions_budget_delete AFTER DELETE ON transactions BEGIN {change_spend("OLD", "-")} END')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS transactions_budget_update
+        AFTER UPDATE OF amount, category, type, date, user_id ON transactions
+        BEGIN {change_spend("OLD", "-")} {change_spend("NEW", "+")} END
+    ''')
+
+def add_data_versions(cursor):
+    # Per-user counter bumped on every write, used to key cached reports
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS data_versions (
+            user_id INTEGER PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+
+def add_transaction_search(cursor):
+    # Full-text index over descriptions and categories, stored in transactions itself
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS transactions_fts
+        USING fts5(description, category, content='transactions', content_rowid='id')
+    ''')
+    insert_new = '''
+        INSERT INTO transactions_fts (rowid, description, category)
+        VALUES (NEW.id, NEW.description, NEW.category);
+    '''
+    delete_old = '''
+        INSERT INTO transactions_fts (transactions_fts, rowid, description, category)
+        VALUES ('delete', OLD.id, OLD.description, OLD.category);
+    '''
+    cursor.execute(f'CREATE TRIGGER IF NOT EXISTS transactions_fts_insert AFTER INSERT ON transactions BEGIN {insert_new} END')
+    cursor.execute(f'CREATE TRIGGER IF NOT EXISTS transactions_fts_delete AFTER DELETE ON transactions BEGIN {delete_old} END')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS transactions_fts_update
+        AFTER UPDATE OF description, category ON transactions
+        BEGIN {delete_old} {insert_new} END
+    ''')
+    # Index the rows that existed before this migration
+    cursor.execute("INSERT INTO transactions_fts (transactions_fts) VALUES ('rebuild')")
+
+def hash_passwords(cursor):
+    # Passwords used to be stored in plain text
+    from passwords import hash_password, is_hashed
+    users = cursor.execute('SELECT id, password FROM users').fetchall()
+    cursor.executemany('UPDATE users SET password = ? WHERE id = ?',
+                       [(hash_password(password), user_id) for user_id, password in users if not is_hashed(password)])
+
+# REAL amount -> INTEGER minor units (cents), rounded half away from zero
+TO_MINOR_UNITS = 'CAST(ROUND({column} * 100) AS INTEGER)'
+
+def store_amounts_in_minor_units(cursor):
+    # SQLite cannot change a column's type, and REAL affinity would turn stored
+    # integers back into floats, so the money tables are rebuilt: create, copy,
+    # drop, rename. Indexes and triggers are saved first and recreated at the
+    # end, because a rename fails while a trigger names a table that is mid-rebuild.
+    tables = ('transactions', 'transaction_summary', 'budgets', 'budget_spend')
+    saved = cursor.execute(f'''
+        SELECT type, name, sql FROM sqlite_master
+        WHERE tbl_name IN ({', '.join('?' * len(tables))}) AND type IN ('index', 'trigger') AND sql IS NOT NULL
+    ''', tables).fetchall()
+    for object_type, name, _ in saved:
+        if object_type == 'trigger':
+            cursor.execute(f'DROP TRIGGER {name}')
+    sequences = cursor.execute("SELECT name, seq FROM sqlite_sequence WHERE name IN ('transactions', 'budgets')").fetchall()
+
+    cursor.execute('''
+        CREATE TABLE transactions_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            amount INTEGER,
+            category TEXT,
+            description TEXT,
+            type TEXT,
+            date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            user_id INTEGER,
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    ''')
+    cursor.execute(f'''
+        INSERT INTO transactions_new (id, amount, category, description, type, date, user_id)
+        SELECT id, {TO_MINOR_UNITS.format(column='amount')}, category, description, type, date, user_id FROM transactions
+    ''')
+
+    # Totals are recomputed from the converted amounts, which also clears any float drift
+    cursor.execute('''
+        CREATE TABLE transaction_summary_new (
+            user_id INTEGER,
+            month TEXT NOT NULL,
+            type TEXT NOT NULL,
+            category TEXT NOT NULL,
+            total INTEGER NOT NULL DEFAULT 0,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, month, type, category)
+        )
+    ''')
+    cursor.execute('''
+        INSERT INTO transaction_summary_new (user_id, month, type, category, total, count)
+        SELECT user_id, IFNULL(strftime('%Y-%m', date), ''), IFNULL(type, ''), IFNULL(category, ''),
+               SUM(IFNULL(amount, 0)), COUNT(*)
+        FROM transactions_new
+        GROUP BY 1, 2, 3, 4
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE budgets_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            category TEXT NOT NULL,
+            period TEXT NOT NULL DEFAULT 'monthly' CHECK (period IN ('monthly', 'weekly')),
+            amount INTEGER NOT NULL,
+            UNIQUE (user_id, category, period),
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    ''')
+    cursor.execute(f'''
+        INSERT INTO budgets_new (id, user_id, category, period, amount)
+        SELECT id, user_id, category, period, {TO_MINOR_UNITS.format(column='amount')} FROM budgets
+    ''')
+    # Points at budgets_new so dropping the old budgets cannot cascade into it;
+    # the rename below rewrites the reference to budgets
+    cursor.execute('''
+        CREATE TABLE budget_spend_new (
+            budget_id INTEGER NOT NULL,
+            period_start TEXT NOT NULL,
+            spent INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (budget_id, period_start),
+            FOREIGN KEY (budget_id) REFERENCES budgets_new(id) ON DELETE CASCADE
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute(f'''
+        INSERT INTO budget_spend_new (budget_id, period_start, spent)
+        SELECT budget_id, period_start, {TO_MINOR_UNITS.format(column='spent')} FROM budget_spend
+    ''')
+
+    for table in ('budget_spend', 'budgets', 'transaction_summary', 'transactions'):
+        cursor.execute(f'DROP TABLE {table}')
+    for table in tables:
+        cursor.execute(f'ALTER TABLE {table}_new RENAME TO {table}')
+    for name, seq in sequences:
+        cursor.execute('UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?', (seq, name))
+    for _, _, sql in saved:
+        cursor.execute(sql)
+
+def normalize_categories(cursor):
+    # Category names move into a per-user categories table and every other table
+    # refers to them by integer id. The tables are rebuilt as in
+    # store_amounts_in_minor_units, but the old indexes and triggers name the
+    # category column, so they are written out again for the new schema. The
+    # search index stores its own copy of the category name, since it can no
+    # longer read it from transactions.
+    tables = ('transactions', 'transaction_summary', 'budgets', 'budget_spend')
+    triggers = cursor.execute(f'''
+        SELECT name FROM sqlite_master
+        WHERE tbl_name IN ({', '.join('?' * len(tables))}) AND type = 'trigger'
+    ''', tables).fetchall()
+    for name, in triggers:
+        cursor.execute(f'DROP TRIGGER {name}')
+    cursor.execute('DROP TABLE IF EXISTS transactions_fts')
+    sequences = cursor.execute("SELECT name, seq FROM sqlite_sequence WHERE name IN ('transactions', 'budgets')").fetchall()
+
+    cursor.execute('''
+        CREATE TABLE categories (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            UNIQUE (user_id, name),
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    ''')
+    cursor.execute('''
+        INSERT INTO categories (user_id, name)
+        SELECT user_id, category FROM transactions WHERE user_id IS NOT NULL AND category IS NOT NULL
+        UNION
+        SELECT user_id, category FROM budgets
+        ORDER BY 1, 2
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE transactions_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            amount INTEGER,
+            category_id INTEGER,
+            description TEXT,
+            type TEXT,
+            date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            user_id INTEGER,
+            FOREIGN KEY (category_id) REFERENCES categories(id),
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    ''')
+    cursor.execute('''
+        INSERT INTO transactions_new (id, amount, category_id, description, type, date, user_id)
+        SELECT t.id, t.amount, c.id, t.description, t.type, t.date, t.user_id
+        FROM transactions t LEFT JOIN categories c ON c.user_id = t.user_id AND c.name = t.category
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE transaction_summary_new (
+            user_id INTEGER,
+            month TEXT NOT NULL,
+            type TEXT NOT NULL,
+            category_id INTEGER NOT NULL,
+            total INTEGER NOT NULL DEFAULT 0,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, month, type, category_id)
+        )
+    ''')
+    cursor.execute('''
+        INSERT INTO transaction_summary_new (user_id, month, type, category_id, total, count)
+        SELECT user_id, IFNULL(strftime('%Y-%m', date), ''), IFNULL(type, ''), IFNULL(category_id, 0),
+               SUM(IFNULL(amount, 0)), COUNT(*)
+        FROM transactions_new
+        GROUP BY 1, 2, 3, 4
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE budgets_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            category_id INTEGER NOT NULL,
+            period TEXT NOT NULL DEFAULT 'monthly' CHECK (period IN ('monthly', 'weekly')),
+            amount INTEGER NOT NULL,
+            UNIQUE (user_id, category_id, period),
+            FOREIGN KEY (category_id) REFERENCES categories(id),
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    ''')
+    cursor.execute('''
+        INSERT INTO budgets_new (id, user_id, category_id, period, amount)
+        SELECT b.id, b.user_id, c.id, b.period, b.amount
+        FROM budgets b JOIN categories c ON c.user_id = b.user_id AND c.name = b.category
+    ''')
+    cursor.execute('''
+        CREATE TABLE budget_spend_new (
+            budget_id INTEGER NOT NULL,
+            period_start TEXT NOT NULL,
+            spent INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (budget_id, period_start),
+            FOREIGN KEY (budget_id) REFERENCES budgets_new(id) ON DELETE CASCADE
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('INSERT INTO budget_spend_new (budget_id, period_start, spent) SELECT budget_id, period_start, spent FROM budget_spend')
+
+    for table in ('budget_spend', 'budgets', 'transaction_summary', 'transactions'):
+        cursor.execute(f'DROP TABLE {table}')
+    for table in tables:
+        cursor.execute(f'ALTER TABLE {table}_new RENAME TO {table}')
+    for name, seq in sequences:
+        cursor.execute('UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?', (seq, name))
+
+    cursor.execute('CREATE INDEX idx_transactions_user_date ON transactions (user_id, date)')
+    cursor.execute('CREATE INDEX idx_transactions_user_type_category ON transactions (user_id, type, category_id, amount)')
+
+    new = summary_key('NEW.')
+    old = summary_key('OLD.')
+    add_new = f'''
+        INSERT OR IGNORE INTO transaction_summary (user_id, month, type, category_id)
+        VALUES (NEW.user_id, {new['month']}, {new['type']}, {new['category_id']});
+        UPDATE transaction_summary
+        SET total = total + IFNULL(NEW.amount, 0), count = count + 1
+        WHERE user_id = NEW.user_id AND month = {new['month']} AND type = {new['type']} AND category_id = {new['category_id']};
+    '''
+    remove_old = f'''
+        UPDATE transaction_summary
+        SET total = total - IFNULL(OLD.amount, 0), count = count - 1
+        WHERE user_id = OLD.user_id AND month = {old['month']} AND type = {old['type']} AND category_id = {old['category_id']};
+        DELETE FROM transaction_summary
+        WHERE user_id = OLD.user_id AND month = {old['month']} AND type = {old['type']} AND category_id = {old['category_id']}
+        AND count <= 0;
+    '''
+    cursor.execute(f'CREATE TRIGGER transactions_summary_insert AFTER INSERT ON transactions BEGIN {add_new} END')
+    cursor.execute(f'CREATE TRIGGER transactions_summary_delete AFTER DELETE ON transactions BEGIN {remove_old} END')
+    cursor.execute(f'''
+        CREATE TRIGGER transactions_summary_update
+        AFTER UPDATE OF amount, category_id, type, date, user_id ON transactions
+        BEGIN {remove_old} {add_new} END
+    ''')
+
+    def change_spend(row, sign):
+        start = budget_period_start('b.period', f'{row}.date')
+        return f'''
+            INSERT OR IGNORE INTO budget_spend (budget_id, period_start)
+            SELECT b.id, {start} FROM budgets b
+            WHERE b.user_id = {row}.user_id AND b.category_id = {row}.category_id AND {row}.type = 'expense';
+            UPDATE budget_spend SET spent = spent {sign} IFNULL({row}.amount, 0)
+            WHERE (budget_id, period_start) IN (
+                SELECT b.id, {start} FROM budgets b
+                WHERE b.user_id = {row}.user_id AND b.category_id = {row}.category_id AND {row}.type = 'expense'
+            );
+        '''
+
+    cursor.execute(f'CREATE TRIGGER transactions_budget_insert AFTER INSERT ON transactions BEGIN {change_spend("NEW", "+")} END')
+    cursor.execute(f'CREATE TRIGGER transactions_budget_delete AFTER DELETE ON transactions BEGIN {change_spend("OLD", "-")} END')
+    cursor.execute(f'''
+        CREATE TRIGGER transactions_budget_update
+        AFTER UPDATE OF amount, category_id, type, date, user_id ON transactions
+        BEGIN {change_spend("OLD", "-")} {change_spend("NEW", "+")} END
+    ''')
+
+    cursor.execute('CREATE VIRTUAL TABLE transactions_fts USING fts5(description, category)')
+    insert_new = '''
+        INSERT INTO transactions_fts (rowid, description, category)
+        VALUES (NEW.id, NEW.description, (SELECT name FROM categories WHERE id = NEW.category_id));
+    '''
+    delete_old = 'DELETE FROM transactions_fts WHERE rowid = OLD.id;'
+    cursor.execute(f'CREATE TRIGGER transactions_fts_insert AFTER INSERT ON transactions BEGIN {insert_new} END')
+    cursor.execute(f'CREATE TRIGGER transactions_fts_delete AFTER DELETE ON transactions BEGIN {delete_old} END')
+    cursor.execute(f'''
+        CREATE TRIGGER transactions_fts_update
+        AFTER UPDATE OF description, category_id ON transactions
+        BEGIN {delete_old} {insert_new} END
+    ''')
+    cursor.execute('''
+        INSERT INTO transactions_fts (rowid, description, category)
+        SELECT t.id, t.description, c.name FROM transactions t LEFT JOIN categories c ON c.id = t.category_id
+    ''')
+
+def add_recurring_rules(cursor):
+    # Schedules for rent, salary and the like; last_run is the last date materialized
+    cursor.execute('''
+        CREATE TABLE recurring_rules (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            amount INTEGER NOT NULL,
+            category_id INTEGER,
+            description TEXT,
+            type TEXT NOT NULL,
+            schedule TEXT NOT NULL,
+            start_date TEXT NOT NULL,
+            end_date TEXT,
+            last_run TEXT,
+            FOREIGN KEY (category_id) REFERENCES categories(id),
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    ''')
+    cursor.execute('CREATE INDEX idx_recurring_rules_user ON recurring_rules (user_id)')
+    # The rule a transaction was materialized from; one transaction per rule and date
+    cursor.execute('ALTER TABLE transactions ADD COLUMN rule_id INTEGER REFERENCES recurring_rules(id) ON DELETE SET NULL')
+    cursor.execute('''
+        CREATE UNIQUE INDEX idx_transactions_rule_date
+        ON transactions (rule_id, date) WHERE rule_id IS NOT NULL
+    ''')
+
+def add_sessions(cursor):
+    # Login sessions; tokens are stored as SHA-256 hashes, expires_at is Unix time
+    cursor.execute('''
+        CREATE TABLE sessions (
+            token_hash TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            expires_at INTEGER NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('CREATE INDEX idx_sessions_user ON sessions (user_id, expires_at)')
+
+def add_transaction_external_ids(cursor):
+    # The bank's own id for imported rows (OFX FITID), so statements dedup on it
+    cursor.execute('ALTER TABLE transactions ADD COLUMN external_id TEXT')
+    cursor.execute('''
+        CREATE UNIQUE INDEX idx_transactions_external_id
+        ON transactions (user_id, external_id) WHERE external_id IS NOT NULL
+    ''')
+
+MIGRATIONS = [
+    create_base_tables,
+    add_transaction_indexes,
+    add_transaction_summary,
+    add_budgets,
+    add_data_versions,
+    add_transaction_search,
+    hash_passwords,
+    store_amounts_in_minor_units,
+    normalize_categories,
+    add_recurring_rules,
+    add_sessions,
+    add_transaction_external_ids,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+def get_schema_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+def migrate(conn, target=SCHEMA_VERSION):
+    """Apply any pending migrations up to `target` and return the resulting schema version"""
+    # The common case: one PRAGMA read and no DDL at all
+    version = get_schema_version(conn)
+    if version >= target:
+        return version
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        # Another connection may have migrated while we waited for the lock
+        version = get_schema_version(conn)
+        for number, migration in enumerate(MIGRATIONS[version:target], start=version + 1):
+            migration(conn.cursor())
+            conn.execute(f'PRAGMA user_version = {number}')
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return get_schema_version(conn)
+
+def explain_query_plan(conn, sql, params=()):
+    """Return the detail lines of SQLite's EXPLAIN QUERY PLAN for a query"""
+    rows = conn.execute(f'EXPLAIN QUERY PLAN {sql}', params).fetchall()
+    return [row[3] for row in rows]
@@ -0,0 +1,41 @@
+# Amounts are stored, summed and cached as integer minor units (cents).
+# Text is parsed with to_minor where it comes in and formatted with
+# format_amount where it goes out; nothing in between uses floats.
+
+MINOR_UNITS = 100
+
+# SQLite INTEGER is a signed 64-bit value
+MAX_MINOR = 2 ** 63 - 1
+
+def to_minor(amount):
+    """Exact integer cents from user or file input such as '12.5', rounding half away from zero"""
+    from decimal import Decimal, ROUND_HALF_UP, InvalidOperation
+    try:
+        value = Decimal(str(amount).strip())
+    except InvalidOperation:
+        raise ValueError(f"invalid amount: {amount!r}") from None
+    if not value.is_finite():
+        raise ValueError(f"invalid amount: {amount!r}")
+    try:
+        minor = int((value * MINOR_UNITS).quantize(Decimal(1), ROUND_HALF_UP))
+    except InvalidOperation:
+        raise ValueError(f"amount out of range: {amount!r}") from None
+    if not -MAX_MINOR - 1 <= minor <= MAX_MINOR:
+        raise ValueError(f"amount out of range: {amount!r}")
+    return minor
+
+def to_major(minor):
+    """Cents as a float in currency units, for JSON and charts"""
+    return minor / MINOR_UNITS
+
+def format_amount(minor, currency_symbol=''):
+    """'-$12.50' from -1250; averages and other fractional cents are rounded"""
+    # minor / 100 is within half an ulp of the exact value, so two-decimal
+    # formatting gives the exact digits for any amount below 10**13
+    return f"{'-' if minor < 0 else ''}{currency_symbol}{abs(minor) / MINOR_UNITS:.2f}"
+
+# The same formatting in SQL, for exports that stream rows straight to a file
+AMOUNT_SQL = "printf('%.2f', {column} / 100.0)"
+
+def amount_sql(column):
+    return AMOUNT_SQL.format(column=column)
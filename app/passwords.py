@@ -0,0 +1,122 @@
+import binascii
+import hashlib
+import hmac
+import os
+import threading
+import time
+from config import load_config
+
+SCHEMES = ('scrypt', 'pbkdf2_sha256')
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+
+def _b64(data):
+    return binascii.b2a_base64(data, newline=False).decode('ascii')
+
+
+def hash_params(config=None):
+    """The KDF scheme and cost parameters new hashes are made with"""
+    config = config or load_config()
+    scheme = config['PASSWORD_SCHEME']
+    if scheme not in SCHEMES:
+        raise ValueError(f"PASSWORD_SCHEME must be one of {', '.join(SCHEMES)}, not {scheme!r}")
+    if scheme == 'scrypt':
+        return (scheme, int(config['SCRYPT_N']), int(config['SCRYPT_R']), int(config['SCRYPT_P']))
+    return (scheme, int(config['PBKDF2_ITERATIONS']))
+
+
+def _derive(password, salt, params):
+    if params[0] == 'scrypt':
+        _, n, r, p = params
+        # scrypt needs 128 * r * n bytes; allow that plus some headroom
+        return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                              maxmem=128 * r * (n + p + 2) + 1024 * 1024, dklen=KEY_BYTES)
+    return hashlib.pbkdf2_hmac('sha256', password.encode(), salt, params[1], dklen=KEY_BYTES)
+
+
+def _parse(stored):
+    """Split a stored hash into (params, salt, key); None for anything else"""
+    parts = (stored or '').split('$')
+    try:
+        if parts[0] == 'scrypt' and len(parts) == 6:
+            params = ('scrypt', int(parts[1]), int(parts[2]), int(parts[3]))
+        elif parts[0] == 'pbkdf2_sha256' and len(parts) == 4:
+            params = ('pbkdf2_sha256', int(parts[1]))
+        else:
+            return None
+        return params, binascii.a2b_base64(parts[-2]), binascii.a2b_base64(parts[-1])
+    except ValueError:
+        return None
+
+
+def hash_password(password, params=None):
+    """Hash with a fresh salt as '<scheme>$<cost...>$<salt>$<key>'"""
+    params = params or hash_params()
+    salt = os.urandom(SALT_BYTES)
+    key = _derive(password, salt, params)
+    return '$'.join([params[0], *map(str, params[1:]), _b64(salt), _b64(key)])
+
+
+def is_hashed(stored):
+    return _parse(stored) is not None
+
+
+def verify_password(password, stored):
+    parsed = _parse(stored)
+    if parsed is None:
+        return False
+    params, salt, key = parsed
+    return hmac.compare_digest(_derive(password, salt, params), key)
+
+
+def needs_rehash(stored, params=None):
+    """True when the hash was made with other parameters than the configured ones"""
+    parsed = _parse(stored)
+    return parsed is None or parsed[0] != (params or hash_params())
+
+
+class AuthCache:
+    """Remembers recent successful logins so repeat logins skip the KDF.
+
+    Passwords are never kept: entries hold an HMAC of the password under a key
+    that only lives in this process, and expire after `ttl` seconds.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.secret = os.urandom(32)
+        self.lock = threading.Lock()
+        self.entries = {}
+
+    def _digest(self, password):
+        return hmac.new(self.secret, password.encode(), hashlib.sha256).digest()
+
+    def get(self, path, username, password):
+        with self.lock:
+            entry = self.entries.get((path, username))
+            if entry is None:
+                return None
+            digest, row, expires = entry
+            if expires < time.monotonic():
+                del self.entries[(path, username)]
+                return None
+        return row if hmac.compare_digest(digest, self._digest(password)) else None
+
+    def put(self, path, username, password, row):
+        if self.ttl <= 0:
+            return
+        with self.lock:
+            self.entries[(path, username)] = (self._digest(password), row, time.monotonic() + self.ttl)
+
+    def invalidate(self, path, username):
+        with self.lock:
+            self.entries.pop((path, username), None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+# Shared by every Database in the process, like the report cache
+auth_cache = AuthCache(float(load_config()['AUTH_CACHE_TTL']))
@@ -0,0 +1,88 @@
+"""Recurrence schedules for recurring transactions.
+
+A schedule is 'daily', 'weekly' or 'monthly', counted from the rule's start
+date, or a cron-like 'day-of-month month day-of-week' spec such as '1,15 * *'
+or '* * 1-5'. Fields take '*', numbers, ranges 'a-b', lists and '/step';
+days of the week run from 0 (Sunday) to 6, and 7 is Sunday as well. As in
+cron, a date matches when either restricted day field matches.
+"""
+import calendar
+from datetime import date, timedelta
+
+INTERVALS = ('daily', 'weekly', 'monthly')
+
+# (name, lowest, highest) of the cron-like fields
+CRON_FIELDS = (('day of month', 1, 31), ('month', 1, 12), ('day of week', 0, 7))
+
+def _parse_field(text, name, low, high):
+    values = set()
+    for part in text.split(','):
+        value_range, _, step = part.partition('/')
+        if value_range == '*':
+            start, end = low, high
+        elif '-' in value_range:
+            start, _, end = value_range.partition('-')
+        else:
+            start = end = value_range
+        try:
+            start, end, step = int(start), int(end), int(step or 1)
+        except ValueError:
+            raise ValueError(f"invalid {name} in schedule: {part!r}") from None
+        if not low <= start <= end <= high or step < 1:
+            raise ValueError(f"{name} out of range in schedule: {part!r}")
+        values.update(range(start, end + 1, step))
+    return values
+
+def parse_schedule(spec):
+    """Validate a schedule and return a form occurrences() understands"""
+    spec = spec.strip().lower()
+    if spec in INTERVALS:
+        return spec
+    fields = spec.split()
+    if len(fields) != len(CRON_FIELDS):
+        raise ValueError(f"schedule must be one of {', '.join(INTERVALS)} or 'day-of-month month day-of-week', not {spec!r}")
+    days, months, weekdays = (_parse_field(text, *field) for text, field in zip(fields, CRON_FIELDS))
+    if 7 in weekdays:
+        weekdays.add(0)
+    return days, months, weekdays, fields[0] == '*', fields[2] == '*'
+
+def _add_months(start, count):
+    # The start's day of month, or the last day of shorter months
+    year, month = divmod(start.month - 1 + count, 12)
+    year += start.year
+    return date(year, month + 1, min(start.day, calendar.monthrange(year, month + 1)[1]))
+
+def occurrences(spec, start, until, after=None):
+    """Yield the dates from start to until (inclusive) that the schedule falls on, skipping those up to `after`"""
+    schedule = parse_schedule(spec)
+    first = start if after is None else max(start, after + timedelta(days=1))
+    if schedule == 'monthly':
+        count = (first.year - start.year) * 12 + first.month - start.month
+        if _add_months(start, count) < first:
+            count += 1
+        current = _add_months(start, count)
+        while current <= until:
+            yield current
+            count += 1
+            current = _add_months(start, count)
+    elif schedule in ('daily', 'weekly'):
+        step = timedelta(days=1 if schedule == 'daily' else 7)
+        # The first step on or after `first`
+        current = start + step * -(-(first - start) // step)
+        while current <= until:
+            yield current
+            current += step
+    else:
+        days, months, weekdays, any_day, any_weekday = schedule
+        current = first
+        while current <= until:
+            # isoweekday() is 7 for Sunday, which the weekday set holds as 0
+            day_match = current.day in days
+            weekday_match = current.isoweekday() % 7 in weekdays
+            if any_day or any_weekday:
+                due = day_match and weekday_match
+            else:
+                due = day_match or weekday_match
+            if due and current.month in months:
+                yield current
+            current += timedelta(days=1)
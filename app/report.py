@@ -1,26 +1,35 @@
 from collections import defaultdict
+from cache import report_cache
+from money import format_amount
 
 def generate_report(db, currency_symbol, user_id, return_data=False):
-    transactions = db.get_all_transactions(user_id)
-    
-    total_income = sum(t.amount for t in transactions if t.type == 'income')
-    total_expenses = sum(t.amount for t in transactions if t.type == 'expense')
-    net_savings = total_income - total_expenses
-
-    category_expenses = defaultdict(float)
-    for t in transactions:
-        if t.type == 'expense':
-            category_expenses[t.category] += t.amount
+    # Repeated views are served from the cache until the user's data changes
+    total_income, total_expenses, net_savings, category_expenses = report_cache.get_or_compute(
+        db, user_id, 'summary', (), lambda: _compute_totals(db, user_id))
 
     if return_data:
-        return transactions, total_income, total_expenses, net_savings, category_expenses
+        return total_income, total_expenses, net_savings, category_expenses
 
     # Print report if not returning data
     print("\nFinancial Report")
-    print(f"Total Income: {currency_symbol}{total_income:.2f}")
-    print(f"Total Expenses: {currency_symbol}{total_expenses:.2f}")
-    print(f"Net Savings: {currency_symbol}{net_savings:.2f}")
+    print(f"Total Income: {format_amount(total_income, currency_symbol)}")
+    print(f"Total Expenses: {format_amount(total_expenses, currency_symbol)}")
+    print(f"Net Savings: {format_amount(net_savings, currency_symbol)}")
     
     print("\nExpenses by Category:")
     for category, amount in category_expenses.items():
-        print(f"{category}: {currency_symbol}{amount:.2f}")
+        print(f"{category}: {format_amount(amount, currency_symbol)}")
+
+def _compute_totals(db, user_id):
+    # Totals are exact integer cents summed in SQL, so no Transaction objects are built here
+    total_income = 0
+    total_expenses = 0
+    category_expenses = defaultdict(int)
+    for txn_type, category, amount in db.get_category_totals(user_id):
+        if txn_type == 'income':
+            total_income += amount
+        elif txn_type == 'expense':
+            total_expenses += amount
+            category_expenses[category] += amount
+    net_savings = total_income - total_expenses
+    return total_income, total_expenses, net_savings, dict(category_expenses)
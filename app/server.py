@@ -0,0 +1,505 @@
+"""Local HTTP/JSON API for other tools, served with asyncio.
+
+    python main.py serve [--host 127.0.0.1] [--port 8765] [--workers 8] [--db FILE]
+
+POST /login trades a FinWise username and password for a session token.
+Every other endpoint except /health takes that token as
+"Authorization: Bearer TOKEN"; checking it is a lookup in memory for all but
+the first request of a session. HTTP Basic credentials work too, for quick
+scripts. Amounts are JSON numbers in currency units on the way out
+and numbers or decimal strings on the way in.
+
+    GET    /health
+    POST   /login             {"username": "alice", "password": "..."}  -> {"token": ..., "expires_at": ...}
+    POST   /logout
+    GET    /transactions?limit=100&order=desc&after=DATE,ID   one page; follow "next" for the rest
+    GET    /transactions?q=groc                               search descriptions and categories
+    POST   /transactions      {"amount": "12.50", "category": "Food", "type": "expense", "description": "", "date": null}
+    GET    /report?period=monthly&limit=12
+    GET    /budgets?category=Food
+    PUT    /budgets/CATEGORY  {"amount": "300", "period": "monthly"}
+    DELETE /budgets/CATEGORY?period=monthly
+    GET    /export.csv?start=YYYY-MM-DD&end=YYYY-MM-DD&category=Food   streamed, chunked
+
+Requests are parsed on the event loop. Database calls run on a fixed pool of
+threads, each call with a connection checked out of an equally sized pool, so
+slow queries never stall the loop and requests beyond the pool size queue up
+instead of opening more connections.
+"""
+import argparse
+import asyncio
+import binascii
+import csv
+import io
+import json
+import re
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qsl, unquote, urlencode, urlsplit
+
+from budget import Budget, budget_status
+from config import load_config, load_currency_symbol
+from database import Database
+from export import CSV_HEADER
+from importer import normalize_date
+from metrics import metrics
+from money import to_major, to_minor
+from report import generate_report
+from timeseries import PERIODS, TimeSeries
+from transaction import Transaction
+
+MAX_BODY_BYTES = 1 << 20
+MAX_PAGE_SIZE = 1000
+# Connections waiting to be accepted; the default of 100 drops bursts of local clients
+LISTEN_BACKLOG = 1024
+
+
+class HTTPError(Exception):
+    """An error response with a JSON {"error": message} body"""
+
+    def __init__(self, status, message, headers=()):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers
+
+
+class Request:
+    __slots__ = ('method', 'path', 'query', 'headers', 'body', 'version')
+
+    def __init__(self, method, path, query, headers, body, version):
+        self.method = method
+        self.path = path
+        self.query = query
+        self.headers = headers
+        self.body = body
+        self.version = version
+
+    @property
+    def keep_alive(self):
+        connection = self.headers.get('connection', '').lower()
+        if self.version == 'HTTP/1.0':
+            return connection == 'keep-alive'
+        return connection != 'close'
+
+    def json(self):
+        try:
+            body = json.loads(self.body or b'{}')
+        except ValueError:
+            raise HTTPError(400, "request body is not valid JSON") from None
+        if not isinstance(body, dict):
+            raise HTTPError(400, "request body must be a JSON object")
+        return body
+
+
+async def read_request(reader):
+    """Parse one request from the stream, or return None once the client has closed it"""
+    line = await reader.readline()
+    if not line.strip():
+        return None
+    try:
+        method, target, version = line.decode('latin-1').split()
+    except ValueError:
+        raise HTTPError(400, "malformed request line") from None
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    if 'transfer-encoding' in headers:
+        raise HTTPError(411, "send the request body with a Content-Length")
+    try:
+        length = int(headers.get('content-length') or 0)
+    except ValueError:
+        raise HTTPError(400, "invalid Content-Length") from None
+    if length > MAX_BODY_BYTES:
+        raise HTTPError(413, f"request body is larger than {MAX_BODY_BYTES} bytes")
+    body = await reader.readexactly(length) if length else b''
+    url = urlsplit(target)
+    return Request(method.upper(), unquote(url.path), dict(parse_qsl(url.query)), headers, body, version.upper())
+
+
+def _int_param(request, name, default, low, high):
+    value = request.query.get(name)
+    if value is None:
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise HTTPError(400, f"{name} must be a whole number") from None
+    if not low <= value <= high:
+        raise HTTPError(400, f"{name} must be between {low} and {high}")
+    return value
+
+
+def _bearer_token(request):
+    scheme, _, token = request.headers.get('authorization', '').partition(' ')
+    if scheme.lower() != 'bearer':
+        return None
+    return token.strip() or None
+
+
+def _amount(body, name='amount'):
+    if body.get(name) is None:
+        raise HTTPError(400, f"missing field: {name}")
+    amount = to_minor(body[name])
+    if amount <= 0:
+        raise HTTPError(400, f"{name} must be greater than zero")
+    return amount
+
+
+def _string(body, name, default=None):
+    value = body.get(name, default)
+    if value is not None and not isinstance(value, str):
+        raise HTTPError(400, f"{name} must be a string")
+    return value
+
+
+def _transaction_json(txn):
+    return {'id': txn.id, 'date': txn.date, 'type': txn.type, 'amount': to_major(txn.amount),
+            'category': txn.category, 'description': txn.description}
+
+
+def _budget_json(category, period, amount, spent):
+    return {'category': category, 'period': period, 'amount': to_major(amount), 'spent': to_major(spent),
+            'status': budget_status(amount, spent)}
+
+
+class DatabasePool:
+    """A fixed set of connections, checked out by one request at a time.
+
+    Checking out waits on the event loop, never on an executor thread, so a
+    request holding a connection across several executor calls (a streamed
+    export) cannot starve the threads the others need.
+    """
+
+    def __init__(self, path, size):
+        self.idle = asyncio.Queue()
+        self.databases = [Database(path, shared=True) for _ in range(size)]
+        for db in self.databases:
+            self.idle.put_nowait(db)
+
+    async def acquire(self):
+        return await self.idle.get()
+
+    def release(self, db):
+        # A handler that failed half-way through a write must not hand its
+        # open transaction, and the write lock with it, to the next request
+        db.discard_transaction()
+        self.idle.put_nowait(db)
+
+    def close(self):
+        for db in self.databases:
+            db.close()
+
+
+class APIServer:
+    def __init__(self, path, workers, page_size, currency_symbol):
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix='finwise-api')
+        self.pool = DatabasePool(path, workers)
+        self.page_size = page_size
+        self.currency_symbol = currency_symbol
+        # (method, path pattern, handler, needs a logged-in user)
+        self.routes = [
+            ('GET', r'/health', self.health, False),
+            ('POST', r'/login', self.login, False),
+            ('POST', r'/logout', self.logout, True),
+            ('GET', r'/transactions', self.list_transactions, True),
+            ('POST', r'/transactions', self.add_transaction, True),
+            ('GET', r'/report', self.report, True),
+            ('GET', r'/budgets', self.list_budgets, True),
+            ('PUT', r'/budgets/(?P<category>[^/]+)', self.set_budget, True),
+            ('DELETE', r'/budgets/(?P<category>[^/]+)', self.delete_budget, True),
+            ('GET', r'/export\.csv', self.export_csv, True),
+        ]
+        self.routes = [(method, re.compile(pattern), handler, auth) for method, pattern, handler, auth in self.routes]
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.pool.close()
+
+    # Handlers run on an executor thread with a checked-out Database. They
+    # return (status, JSON-able body), or (status, iterator of text chunks)
+    # for a streamed response.
+
+    def health(self, db, user, request):
+        return 200, {'status': 'ok'}
+
+    def login(self, db, user, request):
+        body = request.json()
+        user = db.authenticate_user(str(body.get('username', '')), str(body.get('password', '')))
+        if not user:
+            raise HTTPError(401, "invalid username or password")
+        token, expires_at = db.create_session(user.id)
+        return 200, {'token': token, 'expires_at': expires_at, 'user': user.username}
+
+    def logout(self, db, user, request):
+        token = _bearer_token(request)
+        if token is None:
+            raise HTTPError(400, "log out with the session's Bearer token")
+        db.end_session(token)
+        return 200, {'logged_out': True}
+
+    def list_transactions(self, db, user, request):
+        limit = _int_param(request, 'limit', self.page_size, 1, MAX_PAGE_SIZE)
+        query = request.query.get('q')
+        if query:
+            return 200, {'transactions': [_transaction_json(t) for t in db.search_transactions(user.id, query, limit)]}
+
+        order = request.query.get('order', 'desc')
+        after = None
+        if request.query.get('after'):
+            # The (date, id) of the last transaction on the previous page
+            date, _, txn_id = request.query['after'].rpartition(',')
+            if not date or not txn_id.isdigit():
+                raise HTTPError(400, "after must be DATE,ID from the previous page")
+            after = (date, int(txn_id))
+        transactions = db.iter_transactions(user.id, after=after, limit=limit, order=order)
+        page = {'transactions': [_transaction_json(t) for t in transactions]}
+        if len(transactions) == limit:
+            last = transactions[-1]
+            page['next'] = '/transactions?' + urlencode({'limit': limit, 'order': order, 'after': f'{last.date},{last.id}'})
+        return 200, page
+
+    def add_transaction(self, db, user, request):
+        body = request.json()
+        txn_type = _string(body, 'type')
+        if txn_type not in ('income', 'expense'):
+            raise HTTPError(400, "type must be income or expense")
+        category = _string(body, 'category')
+        if not category:
+            raise HTTPError(400, "missing field: category")
+        transaction = Transaction(_amount(body), category, _string(body, 'description') or '', txn_type,
+                                  normalize_date(_string(body, 'date')))
+        db.add_transaction(transaction, user.id)
+        alerts = []
+        if transaction.type == 'expense':
+            alerts = [_budget_json(category, period, amount, spent)
+                      for category, period, amount, spent, status in Budget(db, user.id).evaluate_budgets(transaction.category)
+                      if status != 'ok']
+        return 201, {'added': 1, 'budget_alerts': alerts}
+
+    def report(self, db, user, request):
+        income, expenses, net, categories = generate_report(db, self.currency_symbol, user.id, return_data=True)
+        report = {
+            'currency': self.currency_symbol,
+            'income': to_major(income),
+            'expenses': to_major(expenses),
+            'net': to_major(net),
+            'categories': {category: to_major(amount) for category, amount in categories.items()},
+        }
+        period = request.query.get('period')
+        if period:
+            if period not in PERIODS:
+                raise HTTPError(400, f"period must be one of {', '.join(PERIODS)}")
+            limit = _int_param(request, 'limit', 12, 1, MAX_PAGE_SIZE)
+            report['trend'] = [
+                {'period': bucket, 'income': to_major(i), 'expenses': to_major(e), 'net': to_major(n), 'balance': to_major(b)}
+                for bucket, i, e, n, b in TimeSeries.load(db, user.id, period).rows()[-limit:]
+            ]
+        return 200, report
+
+    def list_budgets(self, db, user, request):
+        statuses = db.get_budget_status(user.id, request.query.get('category'))
+        return 200, {'budgets': [_budget_json(*status) for status in statuses]}
+
+    def set_budget(self, db, user, request, category):
+        body = request.json()
+        period = _string(body, 'period', 'monthly')
+        if period not in Budget.PERIODS:
+            raise HTTPError(400, f"period must be one of {', '.join(Budget.PERIODS)}")
+        amount = _amount(body)
+        db.set_budget(user.id, category, amount, period)
+        return 200, {'category': category, 'period': period, 'amount': to_major(amount)}
+
+    def delete_budget(self, db, user, request, category):
+        period = request.query.get('period', 'monthly')
+        db.delete_budget(user.id, category, period)
+        return 200, {'category': category, 'period': period, 'removed': True}
+
+    def export_csv(self, db, user, request):
+        rows = db.stream_transactions(user.id, request.query.get('start'), request.query.get('end'),
+                                      request.query.get('category'))
+
+        def chunks():
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(CSV_HEADER)
+            for chunk in rows:
+                writer.writerows(chunk)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+            if buffer.tell():
+                yield buffer.getvalue()
+
+        return 200, chunks()
+
+    def _authenticate(self, db, request):
+        token = _bearer_token(request)
+        if token is not None:
+            user = db.get_session_user(token)
+            if user:
+                return user
+            raise HTTPError(401, "session expired or logged out", [('WWW-Authenticate', 'Bearer realm="FinWise"')])
+        scheme, _, credentials = request.headers.get('authorization', '').partition(' ')
+        if scheme.lower() == 'basic':
+            try:
+                username, _, password = binascii.a2b_base64(credentials).decode('utf-8').partition(':')
+            except (binascii.Error, UnicodeDecodeError):
+                username = password = None
+            user = db.authenticate_user(username, password) if username else None
+            if user:
+                return user
+        raise HTTPError(401, "log in at POST /login and send the token as a Bearer token",
+                        [('WWW-Authenticate', 'Bearer realm="FinWise", Basic realm="FinWise"')])
+
+    def _call(self, db, handler, needs_user, request, params):
+        user = self._authenticate(db, request) if needs_user else None
+        return handler(db, user, request, **params)
+
+    def _route(self, request):
+        allowed = []
+        for method, pattern, handler, needs_user in self.routes:
+            match = pattern.fullmatch(request.path)
+            if match:
+                if method == request.method:
+                    return handler, needs_user, match.groupdict()
+                allowed.append(method)
+        if allowed:
+            raise HTTPError(405, f"{request.method} is not supported here", [('Allow', ', '.join(allowed))])
+        raise HTTPError(404, f"no such endpoint: {request.path}")
+
+    async def handle_connection(self, reader, writer):
+        """Serve requests from one client until it disconnects or asks to close"""
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except HTTPError as e:
+                    await self._send_error(writer, e, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                if not await self.dispatch(request, writer):
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            # Gone mid-request, or a header line longer than the stream limit
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, request, writer):
+        """Handle one request and return whether the connection stays open"""
+        start = time.perf_counter()
+        keep_alive = request.keep_alive
+        name = 'http.unrouted'
+        status = 500
+        loop = asyncio.get_running_loop()
+        try:
+            handler, needs_user, params = self._route(request)
+            name = f'http.{handler.__name__}'
+            db = await self.pool.acquire()
+            try:
+                status, body = await loop.run_in_executor(
+                    self.executor, self._call, db, handler, needs_user, request, params)
+                if not isinstance(body, (dict, list)):
+                    # The connection stays checked out until the whole stream is sent
+                    keep_alive = await self._send_stream(writer, request, status, body, keep_alive)
+                    return keep_alive
+            finally:
+                self.pool.release(db)
+            await self._send(writer, status, json.dumps(body).encode(), 'application/json', keep_alive)
+        except HTTPError as e:
+            status = e.status
+            await self._send_error(writer, e, keep_alive)
+        except ValueError as e:
+            status = 400
+            await self._send_error(writer, HTTPError(400, str(e)), keep_alive)
+        except ConnectionError:
+            raise
+        except Exception as e:
+            traceback.print_exc()
+            await self._send_error(writer, HTTPError(500, f"internal error: {e}"), keep_alive=False)
+            keep_alive = False
+        finally:
+            metrics.record(name, (time.perf_counter() - start) * 1000, error=status >= 500)
+        return keep_alive
+
+    async def _send(self, writer, status, body, content_type, keep_alive, headers=()):
+        head = [f'HTTP/1.1 {status} {HTTPStatus(status).phrase}', f'Content-Type: {content_type}',
+                f'Content-Length: {len(body)}', f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        head.extend(f'{name}: {value}' for name, value in headers)
+        writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + body)
+        await writer.drain()
+
+    async def _send_error(self, writer, error, keep_alive):
+        await self._send(writer, error.status, json.dumps({'error': str(error)}).encode(), 'application/json',
+                         keep_alive, error.headers)
+
+    async def _send_stream(self, writer, request, status, chunks, keep_alive):
+        # HTTP/1.0 clients get the raw body and the end of the connection as its end
+        chunked = request.version != 'HTTP/1.0'
+        keep_alive = keep_alive and chunked
+        head = [f'HTTP/1.1 {status} {HTTPStatus(status).phrase}', 'Content-Type: text/csv; charset=utf-8',
+                f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        if chunked:
+            head.append('Transfer-Encoding: chunked')
+        writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1'))
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                # Each fetchmany runs on the executor; draining keeps at most one chunk buffered
+                chunk = await loop.run_in_executor(self.executor, next, chunks, None)
+                if chunk is None:
+                    break
+                data = chunk.encode('utf-8')
+                writer.write(b'%x\r\n%s\r\n' % (len(data), data) if chunked else data)
+                await writer.drain()
+        except ConnectionError:
+            raise
+        except Exception:
+            # The status line is already sent; cutting the stream short is the only signal left
+            traceback.print_exc()
+            return False
+        finally:
+            await loop.run_in_executor(self.executor, chunks.close)
+        if chunked:
+            writer.write(b'0\r\n\r\n')
+            await writer.drain()
+        return keep_alive
+
+
+async def serve(path, host, port, workers, page_size):
+    # Migrate once up front rather than racing on the pool's first connections
+    with Database(path) as db:
+        db.create_tables()
+    api = APIServer(path, workers, page_size, load_currency_symbol())
+    server = await asyncio.start_server(api.handle_connection, host, port, backlog=LISTEN_BACKLOG)
+    try:
+        host, port = server.sockets[0].getsockname()[:2]
+        print(f"Serving on http://{host}:{port}", flush=True)
+        async with server:
+            await server.serve_forever()
+    finally:
+        api.close()
+
+
+def main(argv=None):
+    config = load_config()
+    parser = argparse.ArgumentParser(prog='main.py serve', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default=config['SERVER_HOST'])
+    parser.add_argument('--port', type=int, default=config['SERVER_PORT'], help='0 picks a free port')
+    parser.add_argument('--workers', type=int, default=config['SERVER_WORKERS'],
+                        help='database threads and pooled connections')
+    parser.add_argument('--db', help='database file (default: DB_FILE from config.json)')
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.db, args.host, args.port, max(1, args.workers), int(config['SERVER_PAGE_SIZE'])))
+    except KeyboardInterrupt:
+        pass
+    return 0
@@ -0,0 +1,65 @@
+import hashlib
+import secrets
+import threading
+import time
+from config import load_config
+
+TOKEN_BYTES = 32
+
+def new_token():
+    """A random, URL-safe session token"""
+    return secrets.token_urlsafe(TOKEN_BYTES)
+
+def token_hash(token):
+    # Only the hash is stored, so a copy of the database cannot be used to log in
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class SessionCache:
+    """Sessions validated recently, so checking a token is a dictionary lookup.
+
+    An entry is kept for `ttl` seconds or until its session expires, whichever
+    comes first. Sessions ended in this process are dropped right away; one
+    ended by another process stops working here within `ttl` seconds. Expired
+    entries are swept out at most once per `ttl`, so the cache only holds
+    tokens used recently.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.swept = time.time()
+
+    def get(self, path, key):
+        with self.lock:
+            entry = self.entries.get((path, key))
+            if entry is None:
+                return None
+            row, until = entry
+            if until <= time.time():
+                del self.entries[(path, key)]
+                return None
+            return row
+
+    def put(self, path, key, row, expires_at):
+        if self.ttl <= 0:
+            return
+        now = time.time()
+        with self.lock:
+            if now - self.swept >= self.ttl:
+                self.entries = {entry_key: entry for entry_key, entry in self.entries.items() if entry[1] > now}
+                self.swept = now
+            self.entries[(path, key)] = (row, min(now + self.ttl, expires_at))
+
+    def invalidate(self, path, key):
+        with self.lock:
+            self.entries.pop((path, key), None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+# Shared by every Database in the process, like the auth cache
+session_cache = SessionCache(float(load_config()['SESSION_CACHE_TTL']))
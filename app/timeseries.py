@@ -0,0 +1,127 @@
+from collections import defaultdict
+from datetime import date, timedelta
+from itertools import accumulate
+from cache import report_cache
+from money import format_amount
+
+PERIODS = ('daily', 'weekly', 'monthly', 'yearly')
+
+
+def next_bucket(period, bucket):
+    if period == 'yearly':
+        return str(int(bucket) + 1)
+    if period == 'monthly':
+        year, month = map(int, bucket.split('-'))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        return f'{year:04d}-{month:02d}'
+    step = timedelta(days=7 if period == 'weekly' else 1)
+    return (date.fromisoformat(bucket) + step).isoformat()
+
+
+def bucket_range(period, first, last):
+    """Every bucket from first to last, so empty periods count as zero"""
+    buckets = [first]
+    while buckets[-1] < last:
+        buckets.append(next_bucket(period, buckets[-1]))
+    return buckets
+
+
+def rolling_average(values, window):
+    averages = []
+    total = 0
+    for i, value in enumerate(values):
+        total += value
+        if i >= window:
+            total -= values[i - window]
+        averages.append(total / min(i + 1, window))
+    return averages
+
+
+def deltas(values):
+    """Change from the previous period; the first period has none"""
+    return [None] + [current - previous for previous, current in zip(values, values[1:])]
+
+
+class TimeSeries:
+    """Income and expenses for one user bucketed by day, week, month or year.
+
+    Grouping happens in SQL (monthly and yearly read the summary table), so
+    loading costs O(periods x categories) rows whatever the history length.
+    """
+
+    def __init__(self, period, buckets, income, expenses, category_expenses):
+        self.period = period
+        self.buckets = buckets
+        self.income = income
+        self.expenses = expenses
+        self.category_expenses = category_expenses
+
+    @classmethod
+    def load(cls, db, user_id, period='monthly'):
+        if period not in PERIODS:
+            raise ValueError(f"period must be one of {', '.join(PERIODS)}")
+        return report_cache.get_or_compute(db, user_id, 'timeseries', (period,),
+                                           lambda: cls._load(db, user_id, period))
+
+    @classmethod
+    def _load(cls, db, user_id, period):
+        rows = db.get_period_totals(user_id, period)
+        if not rows:
+            return cls(period, [], [], [], {})
+
+        buckets = bucket_range(period, rows[0][0], rows[-1][0])
+        index = {bucket: i for i, bucket in enumerate(buckets)}
+        income = [0] * len(buckets)
+        expenses = [0] * len(buckets)
+        category_expenses = defaultdict(lambda: [0] * len(buckets))
+        for bucket, txn_type, category, amount in rows:
+            i = index[bucket]
+            if txn_type == 'income':
+                income[i] += amount
+            elif txn_type == 'expense':
+                expenses[i] += amount
+                category_expenses[category][i] += amount
+        return cls(period, buckets, income, expenses, dict(category_expenses))
+
+    @property
+    def net(self):
+        return [i - e for i, e in zip(self.income, self.expenses)]
+
+    @property
+    def balance(self):
+        """Running balance at the end of each period"""
+        return list(accumulate(self.net))
+
+    def rows(self):
+        """(period, income, expenses, net, running balance) for every period"""
+        return list(zip(self.buckets, self.income, self.expenses, self.net, self.balance))
+
+    def category_trends(self, window=3):
+        """(category, latest, change from previous period, rolling average) for the latest period"""
+        trends = []
+        for category, values in sorted(self.category_expenses.items(), key=lambda item: -item[1][-1]):
+            trends.append((category, values[-1], deltas(values)[-1], rolling_average(values, window)[-1]))
+        return trends
+
+    def category_series(self, category, window=3):
+        """(period, amount, change, rolling average) for one category"""
+        values = self.category_expenses.get(category, [0] * len(self.buckets))
+        return list(zip(self.buckets, values, deltas(values), rolling_average(values, window)))
+
+
+def print_time_series(db, currency_symbol, user_id, period='monthly', limit=12, window=3):
+    series = TimeSeries.load(db, user_id, period)
+    if not series.buckets:
+        print("\nNo transactions to chart yet.")
+        return
+
+    print(f"\n{period.capitalize()} Trend")
+    print(f"{'Period':<12}{'Income':>14}{'Expenses':>14}{'Net':>14}{'Balance':>14}")
+    for bucket, income, expenses, net, balance in series.rows()[-limit:]:
+        print(f"{bucket:<12}{format_amount(income, currency_symbol):>14}{format_amount(expenses, currency_symbol):>14}"
+              f"{format_amount(net, currency_symbol):>14}{format_amount(balance, currency_symbol):>14}")
+
+    print(f"\nExpenses by Category ({series.buckets[-1]}, {window}-period average)")
+    for category, latest, change, average in series.category_trends(window):
+        change_text = ('+' if change >= 0 else '') + format_amount(change) if change is not None else "n/a"
+        print(f"{category}: {format_amount(latest, currency_symbol)} (change {change_text}, average {format_amount(average, currency_symbol)})")
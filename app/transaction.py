@@ -1,11 +1,79 @@
+import sys
+from array import array
+from money import format_amount
+
+# Column order expected by Transaction.from_db_row and Transaction.row_factory,
+# selected FROM TRANSACTION_SOURCE so the category comes back as its name
+TRANSACTION_COLUMNS = 't.id, t.amount, c.name, t.description, t.type, t.date'
+TRANSACTION_SOURCE = 'transactions t LEFT JOIN categories c ON c.id = t.category_id'
+
 class Transaction:
-    def __init__(self, amount, category, description, type, date=None):
+    # Slots keep per-object overhead low when whole histories are loaded
+    __slots__ = ('id', 'amount', 'category', 'description', 'type', 'date', 'external_id')
+
+    def __init__(self, amount, category, description, type, date=None, id=None, external_id=None):
+        # amount is in integer minor units (cents), see money.py;
+        # external_id is the bank's id for imported rows, such as an OFX FITID
+        self.id = id
         self.amount = amount
         self.category = category
         self.description = description
         self.type = type
         self.date = date
+        self.external_id = external_id
 
     def __str__(self):
-        # Assuming CURRENCY_SYMBOL is loaded from config or passed in
-        return f"{self.date}: {self.type.capitalize()} - {CURRENCY_SYMBOL}{self.amount:.2f} - {self.category} - {self.description}"
+        return f"{self.date}: {self.type.capitalize()} - {format_amount(self.amount)} - {self.category} - {self.description}"
+
+    @classmethod
+    def from_db_row(cls, row):
+        """Create a Transaction object from a row of TRANSACTION_COLUMNS"""
+        if row:
+            return cls(row[1], row[2], row[3], row[4], row[5], row[0])
+        return None
+
+    @classmethod
+    def row_factory(cls, cursor, row):
+        """sqlite3 row_factory that builds Transactions while rows are fetched"""
+        return cls(row[1], row[2], row[3], row[4], row[5], row[0])
+
+
+class TransactionBatch:
+    """Columnar storage for many transactions, for analytics over long histories.
+
+    Amounts (cents) live in a packed array('q') and categories/types are
+    interned, so a row costs a few machine words instead of a full Python object.
+    """
+    __slots__ = ('ids', 'amounts', 'categories', 'types', 'dates')
+
+    def __init__(self):
+        self.ids = array('q')
+        self.amounts = array('q')
+        self.categories = []
+        self.types = []
+        self.dates = []
+
+    def __len__(self):
+        return len(self.amounts)
+
+    def extend(self, rows):
+        """Append rows of TRANSACTION_COLUMNS"""
+        intern = sys.intern
+        for id, amount, category, description, type, date in rows:
+            self.ids.append(id)
+            self.amounts.append(amount or 0)
+            self.categories.append(intern(category) if category is not None else None)
+            self.types.append(intern(type) if type is not None else None)
+            self.dates.append(date)
+
+    def total(self, type=None):
+        if type is None:
+            return sum(self.amounts)
+        return sum(amount for amount, t in zip(self.amounts, self.types) if t == type)
+
+    def totals_by_category(self, type='expense'):
+        totals = {}
+        for amount, category, t in zip(self.amounts, self.categories, self.types):
+            if t == type:
+                totals[category] = totals.get(category, 0) + amount
+        return totals
@@ -1,8 +1,13 @@
+# Column order expected by User.from_db_row
+USER_COLUMNS = 'id, username, password, email, created_at'
+
 class User:
+    __slots__ = ('id', 'username', 'password', 'email', 'created_at')
+
     def __init__(self, username, password, email=None, user_id=None, created_at=None):
         self.id = user_id
         self.username = username
-        self.password = password  # In a real app, this should be hashed
+        self.password = password  # KDF hash, see passwords.py
         self.email = email
         self.created_at = created_at
 
@@ -20,4 +25,4 @@ class User:
                 email=row[3], 
                 created_at=row[4]
             )
-        return None 
\ No newline at end of file
+        return None
@@ -0,0 +1,170 @@
+import tkinter as tk
+from tkinter import ttk
+from collections import OrderedDict
+
+
+class VirtualTreeview(ttk.Frame):
+    """A Treeview that only holds the rows currently on screen.
+
+    Rows are fetched a page at a time through
+    `fetch_page(page_index, previous_row, on_page, on_error)`, where `previous_row`
+    is the last row of the page before (or None when that page is not cached).
+    The fetch is expected to run in the background and call `on_page(rows)` or
+    `on_error(exception)` back on the Tk thread. Pages are kept in a small LRU
+    page cache. Rows not loaded yet are drawn as placeholders. The Treeview
+    itself only ever contains as many items as fit in the viewport.
+
+    Only one page is fetched at a time. When it arrives, the next page that the
+    viewport is missing is requested, so dragging the scrollbar only loads pages
+    around where it stops.
+    """
+
+    def __init__(self, parent, columns, row_count, fetch_page, format_row,
+                 page_size=100, max_cached_pages=10, column_width=100):
+        super().__init__(parent)
+        self.row_count = row_count
+        self.fetch_page = fetch_page
+        self.format_row = format_row
+        self.page_size = page_size
+        self.max_cached_pages = max_cached_pages
+        self.pages = OrderedDict()
+        # Page index being fetched, and a counter that makes fetches from before a reset() stale
+        self.loading = None
+        self.generation = 0
+        self.error = None
+        self.placeholder = ("Loading...",) + ("",) * (len(columns) - 1)
+        self.top = 0
+        self.visible_rows = 0
+        self.items = []
+
+        self.tree = ttk.Treeview(self, columns=columns, show="headings")
+        for col in columns:
+            self.tree.heading(col, text=col)
+            self.tree.column(col, width=column_width)
+
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.yview)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        # Resizing changes how many rows fit; scrolling moves the viewport
+        self.tree.bind("<Configure>", self._on_resize)
+        self.tree.bind("<MouseWheel>", self._on_mousewheel)
+        self.tree.bind("<Button-4>", lambda event: self.yview("scroll", -3, "units"))
+        self.tree.bind("<Button-5>", lambda event: self.yview("scroll", 3, "units"))
+        self.tree.bind("<Prior>", lambda event: self.yview("scroll", -1, "pages"))
+        self.tree.bind("<Next>", lambda event: self.yview("scroll", 1, "pages"))
+
+    def _row_height(self):
+        height = ttk.Style().lookup("Treeview", "rowheight")
+        try:
+            return int(height) or 20
+        except (TypeError, ValueError):
+            return 20
+
+    def _on_resize(self, event):
+        # One row's worth of height is taken by the headings
+        visible_rows = max(1, event.height // self._row_height() - 1)
+        if visible_rows != self.visible_rows:
+            self.visible_rows = visible_rows
+            self.refresh()
+
+    def _on_mousewheel(self, event):
+        self.yview("scroll", -1 if event.delta > 0 else 1, "units")
+
+    def _request(self, page_index):
+        if self.loading is not None or self.error is not None or page_index in self.pages:
+            return
+        if not 0 <= page_index * self.page_size < self.row_count:
+            return
+        self.loading = page_index
+        previous = self.pages.get(page_index - 1)
+        generation = self.generation
+        self.fetch_page(page_index, previous[-1] if previous else None,
+                        lambda page: self._on_page(generation, page_index, page),
+                        lambda error: self._on_error(generation, error))
+
+    def _on_page(self, generation, page_index, page):
+        if generation != self.generation or not self.winfo_exists():
+            return
+        self.loading = None
+        self.pages[page_index] = page
+        if len(self.pages) > self.max_cached_pages:
+            self.pages.popitem(last=False)
+        self.refresh()
+
+    def _on_error(self, generation, error):
+        if generation != self.generation or not self.winfo_exists():
+            return
+        # Not retried until the user scrolls again
+        self.loading = None
+        self.error = error
+        self.refresh()
+
+    def _get_rows(self, start, stop):
+        """Rows from start to stop, with None for those not loaded yet"""
+        rows = []
+        for page_index in range(start // self.page_size, (stop - 1) // self.page_size + 1):
+            offset = page_index * self.page_size
+            count = min(stop, offset + self.page_size) - max(start, offset)
+            page = self.pages.get(page_index)
+            if page is None:
+                self._request(page_index)
+                rows.extend([None] * count)
+                continue
+            self.pages.move_to_end(page_index)
+            part = page[max(start - offset, 0):stop - offset]
+            rows.extend(part + [None] * (count - len(part)))
+        return rows
+
+    def yview(self, *args):
+        """Scrollbar command: ('moveto', fraction) or ('scroll', n, 'units'|'pages')"""
+        if not args:
+            return
+        max_top = max(self.row_count - self.visible_rows, 0)
+        if args[0] == "moveto":
+            top = int(float(args[1]) * self.row_count)
+        elif args[0] == "scroll":
+            step = self.visible_rows if args[2] == "pages" else 1
+            top = self.top + int(args[1]) * step
+        else:
+            return
+        top = min(max(top, 0), max_top)
+        if top != self.top:
+            self.top = top
+            self.error = None
+            self.refresh()
+
+    def refresh(self):
+        """Redraw the viewport from the page cache, requesting a missing page"""
+        stop = min(self.top + self.visible_rows, self.row_count)
+        rows = self._get_rows(self.top, stop) if stop > self.top else []
+
+        # Reuse the existing items, only adding or removing the difference
+        while len(self.items) < len(rows):
+            self.items.append(self.tree.insert("", tk.END))
+        while len(self.items) > len(rows):
+            self.tree.delete(self.items.pop())
+        placeholder = self.placeholder
+        if self.error is not None:
+            placeholder = (f"Failed to load: {self.error}",) + placeholder[1:]
+        for item, row in zip(self.items, rows):
+            self.tree.item(item, values=placeholder if row is None else self.format_row(row))
+
+        if self.row_count:
+            self.scrollbar.set(self.top / self.row_count, stop / self.row_count)
+        else:
+            self.scrollbar.set(0, 1)
+
+        # Keep the next page warm so scrolling down does not wait on the database
+        if stop > self.top:
+            self._request((stop - 1) // self.page_size + 1)
+
+    def reset(self, row_count):
+        """Drop cached pages, e.g. after the underlying data changed"""
+        self.row_count = row_count
+        self.pages.clear()
+        self.generation += 1
+        self.loading = None
+        self.error = None
+        self.top = 0
+        self.refresh()
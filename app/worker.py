@@ -0,0 +1,104 @@
+import queue
+import threading
+import time
+from metrics import metrics
+
+
+class BackgroundWorker:
+    """Runs database work on background threads and hands results back to Tk.
+
+    Each worker thread opens its own database connection through `db_factory`.
+    Results are queued and delivered on the Tk thread by polling with
+    `root.after`, so callbacks are free to touch widgets.
+
+    Tasks are submitted under a key. Submitting again under the same key, or
+    calling cancel(key), makes any older task with that key stale: it is skipped
+    if it has not started yet and its result is dropped if it has.
+    """
+
+    def __init__(self, root, db_factory, num_workers=2, poll_interval=50):
+        self.root = root
+        self.db_factory = db_factory
+        self.poll_interval = poll_interval
+        self.tasks = queue.Queue()
+        self.results = queue.Queue()
+        self.calls = queue.Queue()
+        self.generations = {}
+        self.running = True
+
+        self.threads = []
+        for i in range(num_workers):
+            thread = threading.Thread(target=self._run, name=f"finwise-worker-{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+        self.root.after(self.poll_interval, self._poll)
+
+    def submit(self, key, task, on_success=None, on_error=None):
+        """Run task(db) on a worker thread; callbacks receive its result or exception"""
+        generation = self.generations.get(key, 0) + 1
+        self.generations[key] = generation
+        self.tasks.put((key, generation, task, on_success, on_error))
+
+    def post(self, callback, *args):
+        """Schedule callback(*args) on the Tk thread, e.g. for progress updates"""
+        self.calls.put((callback, args))
+
+    def cancel(self, key):
+        self.generations[key] = self.generations.get(key, 0) + 1
+
+    def is_current(self, key, generation):
+        return self.generations.get(key) == generation
+
+    def _run(self):
+        # The connection is created, used and closed on this thread only
+        db = self.db_factory()
+        try:
+            while True:
+                item = self.tasks.get()
+                if item is None:
+                    break
+                key, generation, task, on_success, on_error = item
+                if not self.is_current(key, generation):
+                    continue
+                start = time.perf_counter()
+                try:
+                    result = task(db)
+                except Exception as e:
+                    db.discard_transaction()
+                    metrics.record(f'worker.{key}', (time.perf_counter() - start) * 1000, error=True)
+                    self.results.put((key, generation, on_error, e))
+                else:
+                    metrics.record(f'worker.{key}', (time.perf_counter() - start) * 1000)
+                    self.results.put((key, generation, on_success, result))
+        finally:
+            db.close()
+
+    def _poll(self):
+        try:
+            while True:
+                try:
+                    callback, args = self.calls.get_nowait()
+                except queue.Empty:
+                    break
+                callback(*args)
+            while True:
+                try:
+                    key, generation, callback, value = self.results.get_nowait()
+                except queue.Empty:
+                    break
+                if callback and self.is_current(key, generation):
+                    callback(value)
+        finally:
+            # Keep polling even if a callback raised
+            if self.running:
+                self.root.after(self.poll_interval, self._poll)
+
+    def shutdown(self, wait=True):
+        """Stop the worker threads once queued tasks are done and close their connections"""
+        self.running = False
+        for _ in self.threads:
+            self.tasks.put(None)
+        if wait:
+            for thread in self.threads:
+                thread.join()
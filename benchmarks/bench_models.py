@@ -0,0 +1,65 @@
+"""Compare memory and construction time of the transaction models.
+
+Run from the repository root:
+
+    python benchmarks/bench_models.py [ROWS]
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+
+from transaction import Transaction, TransactionBatch
+
+
+class DictTransaction:
+    """The original dict-backed Transaction, kept here as the baseline"""
+    def __init__(self, amount, category, description, type, date=None):
+        self.amount = amount
+        self.category = category
+        self.description = description
+        self.type = type
+        self.date = date
+
+
+def make_rows(count):
+    categories = ['Groceries', 'Rent', 'Transport', 'Dining', 'Utilities', 'Salary']
+    return [
+        (i, i % 50000, categories[i % len(categories)], f'txn {i}',
+         'income' if i % 10 == 0 else 'expense', f'2024-01-{i % 28 + 1:02d} 12:00:00')
+        for i in range(count)
+    ]
+
+
+def measure(label, build, rows):
+    # Time without tracing, then build again to measure what the result holds on to
+    start = time.perf_counter()
+    build(rows)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    result = build(rows)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<28} {elapsed * 1000:9.1f} ms {size / len(rows):9.1f} bytes/row")
+    return result
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    rows = make_rows(count)
+    print(f"{count} rows")
+    measure("dict-backed Transaction", lambda rows: [DictTransaction(r[1], r[2], r[3], r[4], r[5]) for r in rows], rows)
+    measure("slotted Transaction", lambda rows: [Transaction.row_factory(None, r) for r in rows], rows)
+
+    def build_batch(rows):
+        batch = TransactionBatch()
+        batch.extend(rows)
+        return batch
+    measure("TransactionBatch", build_batch, rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Compare integer-cent and float aggregation of amounts.
+
+Run from the repository root:
+
+    python benchmarks/bench_money.py [ROWS]
+
+The same random amounts are stored once as REAL currency units and once as
+INTEGER cents. Each path is summed in SQLite and in Python, and the float
+results are checked against the exact integer total. The last section times
+turning the amounts into display text.
+"""
+import math
+import os
+import random
+import sqlite3
+import sys
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+
+from money import amount_sql, format_amount
+
+
+def timed(label, func, exact=None):
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    if exact is None:
+        drift = ''
+    else:
+        cents = result if isinstance(result, int) else Decimal(str(result)) * 100
+        drift = 'exact' if cents == exact else f'off by {float(cents - exact) / 100:.2e}'
+    print(f"{label:<32} {elapsed * 1000:9.1f} ms  {drift}")
+    return result
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    rng = random.Random(42)
+    cents = [round(rng.lognormvariate(0, 1.2) * 4000) for _ in range(count)]
+    floats = [c / 100 for c in cents]
+    exact = sum(cents)
+    print(f"{count} amounts, exact total {format_amount(exact)}\n")
+
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE real_amounts (user_id INTEGER, amount REAL)')
+    conn.execute('CREATE TABLE integer_amounts (user_id INTEGER, amount INTEGER)')
+    conn.executemany('INSERT INTO real_amounts VALUES (1, ?)', ((f,) for f in floats))
+    conn.executemany('INSERT INTO integer_amounts VALUES (1, ?)', ((c,) for c in cents))
+
+    timed("SQL SUM(REAL)", lambda: conn.execute('SELECT SUM(amount) FROM real_amounts').fetchone()[0], exact)
+    timed("SQL SUM(INTEGER)", lambda: conn.execute('SELECT SUM(amount) FROM integer_amounts').fetchone()[0], exact)
+    timed("SQL fetch + sum(float)", lambda: sum(a for a, in conn.execute('SELECT amount FROM real_amounts')), exact)
+    timed("SQL fetch + sum(int)", lambda: sum(a for a, in conn.execute('SELECT amount FROM integer_amounts')), exact)
+    print()
+    timed("Python sum(float)", lambda: sum(floats), exact)
+    timed("Python math.fsum(float)", lambda: math.fsum(floats), exact)
+    decimals = [Decimal(str(f)) for f in floats]
+    timed("Python sum(Decimal)", lambda: sum(decimals), exact)
+    timed("Python sum(int)", lambda: sum(cents), exact)
+    print()
+    timed("format float f'{x:.2f}'", lambda: [f'{f:.2f}' for f in floats])
+    timed("format_amount(cents)", lambda: [format_amount(c) for c in cents])
+    timed("SQL printf of cents", lambda: conn.execute(
+        f"SELECT {amount_sql('amount')} FROM integer_amounts").fetchall())
+    timed("SQL fetch REAL + f'{x:.2f}'", lambda: [f'{a:.2f}' for a, in conn.execute('SELECT amount FROM real_amounts')])
+
+
+if __name__ == '__main__':
+    main()
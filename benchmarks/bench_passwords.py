@@ -0,0 +1,70 @@
+"""Pick password hashing cost parameters for a target login latency.
+
+Run from the repository root on the machine the app is deployed to:
+
+    python benchmarks/bench_passwords.py [--target-ms 250] [--scheme scrypt]
+
+The cost nearest the target is chosen, and the matching settings for
+config.json are printed.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+
+from passwords import SCHEMES, hash_password
+
+
+def time_hash(params, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        hash_password('correct horse battery staple', params)
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def tune(scheme, target_ms, repeats, r=8, p=1):
+    if scheme == 'scrypt':
+        # scrypt's cost must be a power of two; memory use is 128 * r * n bytes
+        n = 2 ** 10
+        previous = None
+        while True:
+            elapsed = time_hash(('scrypt', n, r, p), repeats)
+            print(f"n={n:<9} {elapsed:8.1f} ms {128 * r * n / 1024 / 1024:8.1f} MiB")
+            if elapsed >= target_ms:
+                break
+            previous = (n, elapsed)
+            n *= 2
+        # Keep whichever of the last two costs lands nearer the target
+        if previous and target_ms / previous[1] < elapsed / target_ms:
+            n, elapsed = previous
+        return {'PASSWORD_SCHEME': 'scrypt', 'SCRYPT_N': n, 'SCRYPT_R': r, 'SCRYPT_P': p}, elapsed
+
+    # PBKDF2 scales linearly with the iteration count, so one sample is enough to aim
+    sample = 100000
+    elapsed = time_hash(('pbkdf2_sha256', sample), repeats)
+    print(f"iterations={sample:<9} {elapsed:8.1f} ms")
+    iterations = max(10000, int(round(sample * target_ms / elapsed, -4)))
+    elapsed = time_hash(('pbkdf2_sha256', iterations), repeats)
+    print(f"iterations={iterations:<9} {elapsed:8.1f} ms")
+    return {'PASSWORD_SCHEME': 'pbkdf2_sha256', 'PBKDF2_ITERATIONS': iterations}, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--target-ms', type=float, default=250, help='login latency to aim for')
+    parser.add_argument('--scheme', choices=SCHEMES, default='scrypt')
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    settings, elapsed = tune(args.scheme, args.target_ms, args.repeats)
+    print(f"\n{elapsed:.1f} ms per hash. Add to config.json:")
+    print(json.dumps(settings, indent=2))
+
+
+if __name__ == '__main__':
+    main()
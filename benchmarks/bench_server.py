@@ -0,0 +1,234 @@
+"""Load-test the local HTTP API with many concurrent clients.
+
+Run from the repository root:
+
+    python benchmarks/bench_server.py [--concurrency 200] [--requests 10000] [--output server.json]
+
+A seeded synthetic database is created in a temporary directory and
+`main.py serve` is started on a free port. Then `--concurrency` keep-alive
+connections share `--requests` requests between them. The requests are a
+mix of transaction pages, searches, reports, budget checks and a share of
+writes (`--writes`). Each user logs in once and sends its session token
+as a Bearer token; with `--auth basic` every request carries the password
+instead. The script reports throughput, latency percentiles per
+kind of request, and error counts. It ends by streaming one full CSV export
+per user.
+"""
+import argparse
+import asyncio
+import binascii
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from database import Database
+from synthetic import populate
+
+MAIN = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'main.py'))
+SEARCH_TERMS = ['coffee', 'rent', 'groc', 'fuel', 'super', 'din']
+
+
+async def read_response(reader):
+    """(status, body bytes) of one response, de-chunking streamed bodies"""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("server closed the connection")
+    status = int(status_line.split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    if headers.get('transfer-encoding') == 'chunked':
+        body = bytearray()
+        while True:
+            size = int((await reader.readline()).strip(), 16)
+            chunk = await reader.readexactly(size + 2)
+            if not size:
+                break
+            body += chunk[:-2]
+        return status, bytes(body)
+    return status, await reader.readexactly(int(headers.get('content-length', 0)))
+
+
+def build_request(method, path, auth, body=None):
+    """`auth` is a whole Authorization header value, such as 'Bearer TOKEN'"""
+    data = json.dumps(body).encode() if body is not None else b''
+    head = (f'{method} {path} HTTP/1.1\r\nHost: localhost\r\nAuthorization: {auth}\r\n'
+            f'Content-Type: application/json\r\nContent-Length: {len(data)}\r\n\r\n')
+    return head.encode('latin-1') + data
+
+
+def pick_request(rng, writes):
+    """(kind, method, path, body) drawn from the request mix"""
+    if rng.random() < writes:
+        return 'add_transaction', 'POST', '/transactions', {
+            'amount': f'{rng.uniform(1, 80):.2f}', 'category': 'Load test', 'type': 'expense', 'description': 'bench'}
+    kind = rng.choices(['page', 'search', 'report', 'trend', 'budgets'], [40, 15, 20, 10, 15])[0]
+    if kind == 'page':
+        return kind, 'GET', f'/transactions?limit={rng.choice((20, 50, 100))}', None
+    if kind == 'search':
+        return kind, 'GET', f'/transactions?q={rng.choice(SEARCH_TERMS)}&limit=20', None
+    if kind == 'report':
+        return kind, 'GET', '/report', None
+    if kind == 'trend':
+        return kind, 'GET', f"/report?period={rng.choice(('monthly', 'weekly'))}&limit=12", None
+    return kind, 'GET', '/budgets', None
+
+
+async def client(host, port, users, remaining, results, writes, seed):
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            kind, method, path, body = pick_request(rng, writes)
+            start = time.perf_counter()
+            try:
+                writer.write(build_request(method, path, rng.choice(users), body))
+                await writer.drain()
+                status, _ = await read_response(reader)
+            except (ConnectionError, asyncio.IncompleteReadError) as e:
+                results.append((kind, time.perf_counter() - start, type(e).__name__))
+                writer.close()
+                reader, writer = await asyncio.open_connection(host, port)
+                continue
+            results.append((kind, time.perf_counter() - start, status))
+    finally:
+        writer.close()
+
+
+async def export_all(host, port, users):
+    """Seconds and bytes for one streamed export per user, one after another"""
+    timings = []
+    for auth in users:
+        reader, writer = await asyncio.open_connection(host, port)
+        start = time.perf_counter()
+        writer.write(build_request('GET', '/export.csv', auth))
+        await writer.drain()
+        status, body = await read_response(reader)
+        timings.append((time.perf_counter() - start, len(body), body.count(b'\n') - 1, status))
+        writer.close()
+    return timings
+
+
+async def log_in(host, port, count, scheme):
+    """Authorization header values for the synthetic users"""
+    # populate() names its users bench_user_N, all with the password "password"
+    names = [f'bench_user_{i}' for i in range(count)]
+    if scheme == 'basic':
+        return ['Basic ' + binascii.b2a_base64(f'{name}:password'.encode(), newline=False).decode() for name in names]
+    headers = []
+    for name in names:
+        reader, writer = await asyncio.open_connection(host, port)
+        writer.write(build_request('POST', '/login', '', {'username': name, 'password': 'password'}))
+        await writer.drain()
+        status, body = await read_response(reader)
+        writer.close()
+        if status != 200:
+            raise RuntimeError(f"login failed for {name}: {body.decode(errors='replace')}")
+        headers.append(f"Bearer {json.loads(body)['token']}")
+    return headers
+
+
+async def run_load(host, port, args):
+    users = await log_in(host, port, args.users, args.auth)
+    remaining = [args.requests]
+    results = []
+    start = time.perf_counter()
+    await asyncio.gather(*(client(host, port, users, remaining, results, args.writes, args.seed + i)
+                           for i in range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+    exports = await export_all(host, port, users)
+    return elapsed, results, exports
+
+
+def percentiles(seconds):
+    ordered = sorted(seconds)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+    return {'p50_ms': pick(0.50), 'p95_ms': pick(0.95), 'p99_ms': pick(0.99), 'max_ms': ordered[-1] * 1000}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, default=200, help='simultaneous keep-alive connections')
+    parser.add_argument('--requests', type=int, default=10000)
+    parser.add_argument('--users', type=int, default=4)
+    parser.add_argument('--transactions', type=int, default=20000, help='per user')
+    parser.add_argument('--workers', type=int, default=8, help='server database threads')
+    parser.add_argument('--writes', type=float, default=0.05, help='share of requests that add a transaction')
+    parser.add_argument('--auth', choices=('bearer', 'basic'), default='bearer',
+                        help='session tokens from /login, or the password on every request')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write results to this JSON file')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, 'bench.db')
+        print(f"Generating {args.users} users x {args.transactions} transactions...")
+        with Database(path) as db:
+            # Bulk inserts are slow on purpose; a warning per batch would bury the results
+            db.conn.slow_query_ms = float('inf')
+            populate(db, args.users, args.transactions, seed=args.seed)
+
+        # Under load every query waits its turn, so only log the ones that are slow by any measure
+        with open(os.path.join(workdir, 'config.json'), 'w') as config_file:
+            json.dump({'SLOW_QUERY_MS': 5000}, config_file)
+        server = subprocess.Popen([sys.executable, MAIN, 'serve', '--db', path, '--port', '0', '--workers', str(args.workers)],
+                                  cwd=workdir, stdout=subprocess.PIPE, text=True)
+        try:
+            line = server.stdout.readline()
+            if not line.startswith('Serving on'):
+                raise RuntimeError(f"server did not start: {line!r}")
+            host, port = line.rsplit('/', 1)[1].strip().rsplit(':', 1)
+            elapsed, results, exports = asyncio.run(run_load(host, int(port), args))
+        finally:
+            server.terminate()
+            server.wait()
+
+    statuses = {}
+    for _, _, status in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    kinds = {}
+    for kind, seconds, status in results:
+        kinds.setdefault(kind, []).append(seconds)
+    summary = {
+        'auth': args.auth,
+        'concurrency': args.concurrency,
+        'requests': len(results),
+        'seconds': elapsed,
+        'requests_per_second': len(results) / elapsed,
+        'statuses': statuses,
+        'latency': percentiles([seconds for _, seconds, _ in results]),
+        'by_kind': {kind: dict(count=len(seconds), **percentiles(seconds)) for kind, seconds in sorted(kinds.items())},
+        'exports': [{'seconds': s, 'bytes': size, 'rows': rows, 'status': status} for s, size, rows, status in exports],
+    }
+
+    print(f"{summary['requests']} requests over {args.concurrency} connections ({args.auth} auth) in {elapsed:.2f} s "
+          f"({summary['requests_per_second']:.0f} requests/s)")
+    print(f"statuses      {statuses}")
+    print(f"{'kind':<16}{'count':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for kind, stats in [('all', dict(count=len(results), **summary['latency']))] + list(summary['by_kind'].items()):
+        print(f"{kind:<16}{stats['count']:>7}{stats['p50_ms']:>9.1f}{stats['p95_ms']:>9.1f}{stats['p99_ms']:>9.1f}{stats['max_ms']:>9.1f}")
+    for export in summary['exports']:
+        rate = export['rows'] / export['seconds'] if export['seconds'] else 0
+        print(f"export        {export['rows']} rows, {export['bytes'] / 1e6:.1f} MB in {export['seconds'] * 1000:.0f} ms "
+              f"({rate:.0f} rows/s, status {export['status']})")
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(summary, output_file, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
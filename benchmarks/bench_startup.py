@@ -0,0 +1,82 @@
+"""Measure cold start of the CLI up to its first prompt.
+
+Run from the repository root:
+
+    python benchmarks/bench_startup.py [--repeats 10] [--output startup.json]
+
+Each run starts `python -X importtime main.py --cli` in an empty directory,
+times how long the login menu takes to appear, and then exits. The import
+times reported by Python are summed and the slowest imports are listed.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+MAIN = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'main.py'))
+PROMPT = b'Choose an option: '
+
+
+def run_once(workdir):
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, '-X', 'importtime', MAIN, '--cli'], cwd=workdir,
+                               stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    output = b''
+    while not output.endswith(PROMPT):
+        chunk = process.stdout.read1(4096)
+        if not chunk:
+            raise RuntimeError(f"main.py exited before the first prompt: {output.decode(errors='replace')}")
+        output += chunk
+    elapsed = time.perf_counter() - start
+    _, stderr = process.communicate(b'3\n')
+    return elapsed, parse_importtime(stderr.decode(errors='replace'))
+
+
+def parse_importtime(text):
+    """{module: cumulative microseconds} for the top-level imports"""
+    imports = {}
+    for line in text.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Nested imports are indented; only count the top level so nothing is counted twice
+        if not name.startswith('  '):
+            imports[name.strip()] = int(cumulative)
+    return imports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeats', type=int, default=10)
+    parser.add_argument('--top', type=int, default=10, help='number of slowest imports to list')
+    parser.add_argument('--output', help='write results to this JSON file')
+    args = parser.parse_args()
+
+    timings = []
+    imports = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        # The first run creates the database, so it is not counted
+        run_once(workdir)
+        for _ in range(args.repeats):
+            elapsed, imports = run_once(workdir)
+            timings.append(elapsed)
+
+    total_import_ms = sum(imports.values()) / 1000
+    print(f"first prompt  {statistics.median(timings) * 1000:8.1f} ms median, {min(timings) * 1000:.1f} ms min")
+    print(f"imports       {total_import_ms:8.1f} ms")
+    for name, micros in sorted(imports.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"    {name:<30}{micros / 1000:8.1f} ms")
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump({'seconds': statistics.median(timings), 'min_seconds': min(timings),
+                       'import_ms': total_import_ms, 'imports': imports}, output_file, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
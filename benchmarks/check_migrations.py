@@ -0,0 +1,226 @@
+"""Upgrade a database from the original schema and check that no data was lost.
+
+Run from the repository root:
+
+    python benchmarks/check_migrations.py [--users 3] [--transactions 2000]
+
+A seeded database is created in a temporary directory with the schema of the
+first release: REAL amounts and plain-text passwords. It is migrated to the
+version just before amounts become integer cents, and budgets are set there.
+Then it is migrated to the latest version. The script checks integrity and
+foreign keys, every amount and category, full-text search, the summary and
+budget totals, logins and the AUTOINCREMENT sequence. A write after the
+upgrade must still reach search and the summary through the new triggers.
+The script prints each failed check and exits with status 1 if there were any.
+"""
+import argparse
+import contextlib
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+
+from database import Database
+from migrations import MIGRATIONS, SCHEMA_VERSION, budget_period_start, migrate, store_amounts_in_minor_units
+from transaction import Transaction
+
+# The tables as the first release created them, before any migration existed
+BASELINE_SCHEMA = '''
+    CREATE TABLE transactions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        amount REAL,
+        category TEXT,
+        description TEXT,
+        type TEXT,
+        date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        user_id INTEGER,
+        FOREIGN KEY (user_id) REFERENCES users(id)
+    );
+    CREATE TABLE users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT UNIQUE NOT NULL,
+        password TEXT NOT NULL,
+        email TEXT UNIQUE,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+'''
+CATEGORIES = ['Food', 'Rent', 'Coffee', 'Travel', 'Salary', 'Health insurance']
+BUDGET_CATEGORIES = ['Food', 'Coffee']
+WORDS = ['coffee', 'groceries', 'rent', 'fuel', 'cinema', 'pharmacy', 'bakery', 'train']
+# Float amounts that drift when summed or scaled as REAL
+AWKWARD_AMOUNTS = [0.1, 0.2, 0.29, 1.15, 4.35, 19.99, 1234567.89]
+
+
+def random_rows(rng, count, now):
+    """(amount, category, description, type, date) rows over the last 14 months"""
+    rows = []
+    for i in range(count):
+        amount = AWKWARD_AMOUNTS[i] if i < len(AWKWARD_AMOUNTS) else round(rng.uniform(0.01, 500), 2)
+        txn_type = 'income' if rng.random() < 0.2 else 'expense'
+        description = ' '.join(rng.sample(WORDS, rng.randint(0, 2)))
+        date = now - timedelta(days=rng.uniform(0, 420))
+        rows.append((amount, rng.choice(CATEGORIES), description, txn_type, date.strftime('%Y-%m-%d %H:%M:%S')))
+    return rows
+
+
+def build(path, users, transactions, seed):
+    """Create the old database; return {user_id: (username, password, {transaction id: row})} of everything in it"""
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    conn = sqlite3.connect(path)
+    conn.executescript(BASELINE_SCHEMA)
+    expected = {}
+    for i in range(users):
+        login = (f'user{i}', f'secret{i}')
+        user_id = conn.execute('INSERT INTO users (username, password) VALUES (?, ?)', login).lastrowid
+        expected[user_id] = login + ({},)
+    # Half the history is written by the first release, the rest after budgets exist
+    half = transactions // 2
+    for user_id, (_, _, rows) in expected.items():
+        for row in random_rows(rng, half, now):
+            rows[conn.execute('INSERT INTO transactions (amount, category, description, type, date, user_id) '
+                              'VALUES (?, ?, ?, ?, ?, ?)', row + (user_id,)).lastrowid] = row
+    conn.commit()
+
+    # Budgets as the last REAL-amount version stored them, spend seeded from the history
+    migrate(conn, MIGRATIONS.index(store_amounts_in_minor_units))
+    for user_id in expected:
+        for category in BUDGET_CATEGORIES:
+            budget_id = conn.execute("INSERT INTO budgets (user_id, category, period, amount) VALUES (?, ?, 'monthly', ?)",
+                                     (user_id, category, 250.5)).lastrowid
+            conn.execute(f'''
+                INSERT INTO budget_spend (budget_id, period_start, spent)
+                SELECT ?, {budget_period_start("'monthly'", 'date')}, SUM(amount) FROM transactions
+                WHERE user_id = ? AND type = 'expense' AND category = ?
+                GROUP BY 2
+            ''', (budget_id, user_id, category))
+    for user_id, (_, _, rows) in expected.items():
+        for row in random_rows(rng, transactions - half, now):
+            rows[conn.execute('INSERT INTO transactions (amount, category, description, type, date, user_id) '
+                              'VALUES (?, ?, ?, ?, ?, ?)', row + (user_id,)).lastrowid] = row
+    conn.commit()
+    conn.close()
+    return expected
+
+
+def cents(amount):
+    return int(Decimal(repr(amount)) * 100)
+
+
+def matches(row, term):
+    """Whether full-text search should find the row: a word of its description or category starts with term"""
+    return any(word.startswith(term.lower()) for word in f'{row[2]} {row[1]}'.lower().split())
+
+
+def check(db, expected):
+    """Return a list of failed checks"""
+    failures = []
+    conn = db.conn
+    if conn.execute('PRAGMA user_version').fetchone()[0] != SCHEMA_VERSION:
+        failures.append('schema is not at the latest version')
+    if conn.execute('PRAGMA integrity_check').fetchone()[0] != 'ok':
+        failures.append('integrity_check failed')
+    if conn.execute('PRAGMA foreign_key_check').fetchall():
+        failures.append('foreign_key_check found orphaned rows')
+    drift = db.verify_summary()
+    if drift:
+        failures.append(f'transaction_summary differs from the transactions in {len(drift)} rows')
+
+    month = datetime.now(timezone.utc).strftime('%Y-%m')
+    for user_id, (username, password, rows) in expected.items():
+        stored = {txn_id: (amount, kind) for txn_id, amount, kind in
+                  conn.execute('SELECT id, amount, typeof(amount) FROM transactions WHERE user_id = ?', (user_id,))}
+        if set(stored) != set(rows):
+            failures.append(f'user {user_id}: {len(rows)} transactions before, {len(stored)} after')
+        wrong = [txn_id for txn_id, row in rows.items() if stored.get(txn_id) != (cents(row[0]), 'integer')]
+        if wrong:
+            failures.append(f'user {user_id}: {len(wrong)} amounts not converted to cents, e.g. id {wrong[0]}')
+
+        names = {txn.id: txn.category for txn in db.get_all_transactions(user_id)}
+        wrong = [txn_id for txn_id, row in rows.items() if names.get(txn_id) != row[1]]
+        if wrong:
+            failures.append(f'user {user_id}: {len(wrong)} transactions lost their category, e.g. id {wrong[0]}')
+        if db.get_categories(user_id) != sorted({row[1] for row in rows.values()}):
+            failures.append(f'user {user_id}: categories table holds {db.get_categories(user_id)}')
+
+        for term in WORDS + ['insur', 'Coffee']:
+            found = {txn.id for txn in db.search_transactions(user_id, term, limit=len(rows) + 1)}
+            if found != {txn_id for txn_id, row in rows.items() if matches(row, term)}:
+                failures.append(f'user {user_id}: search for {term!r} finds {len(found)} transactions, '
+                                f'expected {sum(matches(row, term) for row in rows.values())}')
+
+        totals = {}
+        for amount, category, _, txn_type, _ in rows.values():
+            totals[txn_type, category] = totals.get((txn_type, category), 0) + cents(amount)
+        if {(txn_type, category): total for txn_type, category, total in db.get_category_totals(user_id)} != totals:
+            failures.append(f'user {user_id}: category totals differ')
+
+        budgets = db.get_budget_status(user_id)
+        if sorted(budget[0] for budget in budgets) != sorted(BUDGET_CATEGORIES):
+            failures.append(f'user {user_id}: budgets for {[budget[0] for budget in budgets]} after the upgrade')
+        for category, period, amount, spent in budgets:
+            expected_spent = sum(cents(row[0]) for row in rows.values()
+                                 if row[1] == category and row[3] == 'expense' and row[4].startswith(month))
+            if (amount, spent) != (25050, expected_spent):
+                failures.append(f'user {user_id}: {category} budget is {amount} with {spent} spent, '
+                                f'expected 25050 with {expected_spent}')
+
+        if not db.authenticate_user(username, password):
+            failures.append(f'{username} cannot log in with the old password')
+
+    last_id = max(max(rows) for _, _, rows in expected.values())
+    if conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'transactions'").fetchone()[0] < last_id:
+        failures.append('the transactions AUTOINCREMENT sequence went backwards')
+    return failures
+
+
+def check_writes(db, user_id):
+    """Add and clear transactions through the upgraded schema and return a list of failed checks"""
+    failures = []
+    db.add_transaction(Transaction(1234, 'Zoo', 'zeppelin ride', 'expense'), user_id)
+    if [txn.category for txn in db.search_transactions(user_id, 'zeppelin')] != ['Zoo']:
+        failures.append('a transaction added after the upgrade is not found by search')
+    with contextlib.redirect_stdout(None):
+        db.clear_transactions(user_id)
+    if db.search_transactions(user_id, 'coffee') or db.get_category_totals(user_id):
+        failures.append('cleared transactions are still in the search index or the summary')
+    if db.verify_summary():
+        failures.append('transaction_summary drifted after writes to the upgraded schema')
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=3)
+    parser.add_argument('--transactions', type=int, default=2000, help='per user')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, 'baseline.db')
+        expected = build(path, args.users, args.transactions, args.seed)
+        with Database(path) as db:
+            db.conn.slow_query_ms = float('inf')
+            failures = check(db, expected)
+            # Migrating again must find nothing to do and change nothing
+            if not failures:
+                db.create_tables()
+                failures = check(db, expected)
+            if not failures:
+                failures = check_writes(db, min(expected))
+
+    rows = args.users * args.transactions
+    if failures:
+        for failure in failures:
+            print(f"FAIL  {failure}")
+        sys.exit(1)
+    print(f"OK    {args.users} users, {rows} transactions upgraded to schema version {SCHEMA_VERSION}")
+
+
+if __name__ == '__main__':
+    main()
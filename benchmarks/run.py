@@ -0,0 +1,167 @@
+"""Benchmark the data and report paths on synthetic data.
+
+Run from the repository root:
+
+    python benchmarks/run.py --users 3 --transactions 50000 --output results.json
+    python benchmarks/run.py --compare results.json
+
+Each benchmark is timed over several repeats (median and minimum are kept) and
+then run once more under tracemalloc for its peak Python memory. Results are
+written as JSON so two runs can be compared with --compare.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from database import Database
+from export import export_report_to_csv
+from report import generate_report
+from timeseries import TimeSeries
+from cache import report_cache
+from synthetic import generate_transactions, populate
+
+
+def measure(func, repeats, setup=None):
+    timings = []
+    for _ in range(repeats):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+
+    if setup:
+        setup()
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'seconds': statistics.median(timings),
+        'min_seconds': min(timings),
+        'repeats': repeats,
+        'peak_bytes': peak,
+    }
+
+
+def run_benchmarks(workdir, users, transactions, seed, repeats):
+    db_path = os.path.join(workdir, 'bench.db')
+    csv_path = os.path.join(workdir, 'bench.csv')
+    results = {}
+
+    with Database(db_path) as db:
+        # Bulk inserts and full scans are slow on purpose here; a warning per batch would bury the results
+        db.conn.slow_query_ms = float('inf')
+        start = time.perf_counter()
+        user_ids = populate(db, users, transactions, seed)
+        elapsed = time.perf_counter() - start
+        rows = users * transactions
+        results['populate'] = {'seconds': elapsed, 'rows': rows, 'rows_per_second': rows / elapsed}
+
+        user_id = user_ids[0]
+
+        # Insert throughput: one batch into a fresh user per repeat
+        rng = random.Random(seed + 1)
+        batch = generate_transactions(rng, 10000, datetime(2030, 1, 1), 1)
+        insert_users = []
+
+        def new_insert_user():
+            username = f'bench_insert_{len(insert_users)}'
+            db.add_user(username, 'password')
+            insert_users.append(db.get_user_by_username(username).id)
+        results['insert_batch'] = measure(lambda: db.add_transactions(batch, insert_users[-1]), repeats, new_insert_user)
+        results['insert_batch']['rows'] = len(batch)
+        results['insert_batch']['rows_per_second'] = len(batch) / results['insert_batch']['seconds']
+
+        results['load_full_history'] = measure(lambda: db.get_all_transactions(user_id), repeats)
+        results['load_transaction_batch'] = measure(lambda: db.get_transaction_batch(user_id), repeats)
+        results['first_page'] = measure(lambda: db.iter_transactions(user_id, limit=100), repeats)
+
+        # Reports are measured uncached, then once more from the cache
+        def report():
+            report_cache.clear()
+            generate_report(db, '$', user_id, return_data=True)
+        results['report_aggregation'] = measure(report, repeats)
+        results['report_cached'] = measure(lambda: generate_report(db, '$', user_id, return_data=True), repeats)
+
+        def daily_series():
+            report_cache.clear()
+            TimeSeries.load(db, user_id, 'daily')
+        results['timeseries_daily'] = measure(daily_series, repeats)
+
+        def monthly_series():
+            report_cache.clear()
+            TimeSeries.load(db, user_id, 'monthly')
+        results['timeseries_monthly'] = measure(monthly_series, repeats)
+
+        results['search'] = measure(lambda: db.search_transactions(user_id, 'coff'), repeats)
+        results['csv_export'] = measure(lambda: export_report_to_csv(db, '$', user_id, csv_path), repeats)
+
+    return results
+
+
+def compare(current, baseline):
+    print(f"\n{'benchmark':<24}{'baseline':>12}{'current':>12}{'change':>10}")
+    for name, result in current['results'].items():
+        before = baseline['results'].get(name)
+        if not before:
+            continue
+        ratio = result['seconds'] / before['seconds'] if before['seconds'] else float('inf')
+        print(f"{name:<24}{before['seconds'] * 1000:>10.1f}ms{result['seconds'] * 1000:>10.1f}ms{ratio:>9.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=3)
+    parser.add_argument('--transactions', type=int, default=20000, help='transactions per user')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--output', help='write results to this JSON file')
+    parser.add_argument('--compare', help='compare against a previous JSON results file')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = run_benchmarks(workdir, args.users, args.transactions, args.seed, args.repeats)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'users': args.users,
+            'transactions_per_user': args.transactions,
+            'seed': args.seed,
+        },
+        'results': results,
+    }
+
+    for name, result in results.items():
+        peak = result.get('peak_bytes')
+        peak_text = f"{peak / 1024 / 1024:8.1f} MiB peak" if peak is not None else ""
+        print(f"{name:<24}{result['seconds'] * 1000:10.1f} ms  {peak_text}")
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(report, output_file, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            compare(report, json.load(baseline_file))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""Seeded synthetic data for the benchmarks.
+
+Each user gets a monthly salary plus expenses drawn from a fixed category mix,
+with log-normal amounts and dates spread evenly over the chosen number of years.
+The same seed always produces the same data.
+"""
+import random
+from datetime import datetime, timedelta
+
+from transaction import Transaction
+
+# (category, share of expense rows, median amount in currency units)
+EXPENSE_CATEGORIES = [
+    ('Groceries', 0.30, 45.0),
+    ('Dining', 0.18, 25.0),
+    ('Transport', 0.15, 12.0),
+    ('Shopping', 0.12, 60.0),
+    ('Utilities', 0.08, 90.0),
+    ('Entertainment', 0.07, 30.0),
+    ('Health', 0.05, 55.0),
+    ('Travel', 0.03, 400.0),
+    ('Rent', 0.02, 1500.0),
+]
+DESCRIPTIONS = {
+    'Groceries': ['Supermarket', 'Farmers market', 'Corner shop'],
+    'Dining': ['Coffee', 'Lunch', 'Dinner out', 'Takeaway'],
+    'Transport': ['Bus fare', 'Train ticket', 'Fuel', 'Taxi'],
+    'Shopping': ['Clothes', 'Electronics', 'Books'],
+    'Utilities': ['Electricity', 'Water', 'Internet', 'Phone'],
+    'Entertainment': ['Cinema', 'Concert', 'Streaming'],
+    'Health': ['Pharmacy', 'Dentist', 'Gym'],
+    'Travel': ['Flight', 'Hotel'],
+    'Rent': ['Monthly rent'],
+}
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def generate_transactions(rng, count, start, years):
+    """Return `count` transactions for one user, oldest first"""
+    span = int(years * 365 * 24 * 3600)
+    categories = [c for c, _, _ in EXPENSE_CATEGORIES]
+    weights = [w for _, w, _ in EXPENSE_CATEGORIES]
+    medians = {c: m for c, _, m in EXPENSE_CATEGORIES}
+
+    # Transactions hold integer cents
+    salary = round(rng.uniform(2500, 6000) * 100)
+    salaries = min(count // 20, int(years * 12))
+    transactions = []
+    for month in range(salaries):
+        date = start + timedelta(days=month * 30.44)
+        transactions.append(Transaction(salary, 'Salary', 'Monthly salary', 'income', date.strftime(DATE_FORMAT)))
+
+    for _ in range(count - salaries):
+        category = rng.choices(categories, weights)[0]
+        amount = round(rng.lognormvariate(0, 0.6) * medians[category] * 100)
+        date = start + timedelta(seconds=rng.randrange(span))
+        transactions.append(Transaction(amount, category, rng.choice(DESCRIPTIONS[category]), 'expense',
+                                        date.strftime(DATE_FORMAT)))
+
+    transactions.sort(key=lambda t: t.date)
+    return transactions
+
+
+def populate(db, users, transactions_per_user, seed=42, years=5, batch_size=5000):
+    """Create `users` users with their transactions; return the user ids"""
+    rng = random.Random(seed)
+    start = datetime(2020, 1, 1)
+    user_ids = []
+    for i in range(users):
+        username = f'bench_user_{i}'
+        db.add_user(username, 'password')
+        user_id = db.get_user_by_username(username).id
+        transactions = generate_transactions(rng, transactions_per_user, start, years)
+        for offset in range(0, len(transactions), batch_size):
+            db.add_transactions(transactions[offset:offset + batch_size], user_id)
+        user_ids.append(user_id)
+    return user_ids
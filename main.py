@@ -1,14 +1,15 @@
+import atexit
 import sys
 import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), 'app')))
 
+# Only what every command needs is imported up front; the rest is imported
+# where it is first used, so the first prompt appears sooner
 from app.database import Database
-from app.transaction import Transaction
-from app.user import User
-from app.report import generate_report
-from app.config import save_currency_symbol, load_currency_symbol
-from app.budget import Budget
-from export import export_report_to_csv
+from app.config import load_config, save_currency_symbol, load_currency_symbol, load_import_batch_size
+from app.money import to_minor, format_amount
+# Bare import: the app modules import it this way, so this is the same registry
+from metrics import metrics, configure_logging
 
 
 def login_menu():
@@ -26,7 +27,9 @@ def main_menu():
     print("4. Manage Budget")
     print("5. Clear All Transactions")
     print("6. Export Report to CSV") 
-    print("7. Logout")
+    print("7. Search Transactions")
+    print("8. Recurring Transactions")
+    print("9. Logout")
     return input("Choose an option: ")
 
 def login(db):
@@ -58,8 +61,9 @@ def signup(db):
         print("Username or email already exists. Please try again.")
         return False
 
-def add_transaction(db, currency_symbol, user_id):
-    amount = float(input("Enter amount: "))
+def add_transaction(db, currency_symbol, user_id, budget=None):
+    from app.transaction import Transaction
+    amount = to_minor(input("Enter amount: "))
     category = input("Enter category: ")
     description = input("Enter description: ")
     transaction_type = input("Enter type (income/expense): ").lower()
@@ -69,20 +73,130 @@ def add_transaction(db, currency_symbol, user_id):
     
     # Add the transaction to the database
     db.add_transaction(transaction, user_id)
-    print(f"Transaction added successfully! {currency_symbol}{amount:.2f}")
+    print(f"Transaction added successfully! {format_amount(amount, currency_symbol)}")
 
-    transactions = db.get_all_transactions(user_id)
+    # Spend is tracked per period, so this checks the running total
+    if transaction_type == 'expense' and budget:
+        budget.check_budget(category)
 
-def view_transactions(db, currency_symbol, user_id):
-    transactions = db.get_all_transactions(user_id)
+def view_transactions(db, currency_symbol, user_id, page_size=20):
+    # Fetch one page at a time, most recent first
+    transactions = db.iter_transactions(user_id, limit=page_size)
     if not transactions:
         print("No transactions found.")
         return
     
+    while transactions:
+        for txn in transactions:
+            print(f"{txn.date}: {txn.type.capitalize()} - {format_amount(txn.amount, currency_symbol)} - {txn.category} - {txn.description}")
+        if len(transactions) < page_size:
+            break
+        if input("Press Enter for more, or 'q' to stop: ").lower() == 'q':
+            break
+        last = transactions[-1]
+        transactions = db.iter_transactions(user_id, after=(last.date, last.id), limit=page_size)
+
+def show_report(db, currency_symbol, user_id):
+    from app.report import generate_report
+    from app.timeseries import print_time_series, PERIODS
+    generate_report(db, currency_symbol, user_id)
+
+    period = input(f"\nTrend period ({'/'.join(PERIODS)}) [monthly]: ").lower() or 'monthly'
+    if period not in PERIODS:
+        print("Invalid period. Please try again.")
+        return
+    print_time_series(db, currency_symbol, user_id, period)
+
+def export_transactions(db, currency_symbol, user_id, filename='financial_report.csv'):
+    from export import export_report_to_csv
+
+    def show_progress(rows_written):
+        print(f"\rExported {rows_written} transactions...", end="", flush=True)
+
+    while True:
+        # Blank answers export everything
+        start_date = input("Start date (YYYY-MM-DD, optional): ") or None
+        end_date = input("End date (YYYY-MM-DD, optional): ") or None
+        category = input("Category (optional): ") or None
+        try:
+            rows_written = export_report_to_csv(db, currency_symbol, user_id, filename, start_date=start_date,
+                                                end_date=end_date, category=category, progress=show_progress)
+            break
+        except ValueError as e:
+            print(f"{e}. Please try again.")
+    if rows_written:
+        print()
+    print(f"Report exported to {filename}")
+
+def search_transactions(db, currency_symbol, user_id, limit=50):
+    query = input("Search for: ")
+    transactions = db.search_transactions(user_id, query, limit)
+    if not transactions:
+        print("No matching transactions found.")
+        return
+
     for txn in transactions:
-        print(f"{txn.date}: {txn.type.capitalize()} - {currency_symbol}{txn.amount:.2f} - {txn.category} - {txn.description}")
+        print(f"{txn.date}: {txn.type.capitalize()} - {format_amount(txn.amount, currency_symbol)} - {txn.category} - {txn.description}")
+    if len(transactions) == limit:
+        print(f"Showing the first {limit} matches. Refine the search to narrow them down.")
+
+def run_recurring(db, user_id):
+    # Catch up on rent, salary and other rules that fell due since the last run
+    added = db.materialize_recurring(user_id)
+    if added:
+        print(f"Added {added} recurring transactions.")
+    return added
+
+def manage_recurring(db, currency_symbol, user_id):
+    from app.transaction import Transaction
+    while True:
+        print("\nRecurring Transactions")
+        print("1. Add Recurring Transaction")
+        print("2. View Recurring Transactions")
+        print("3. Remove Recurring Transaction")
+        print("4. Add Due Transactions Now")
+        print("5. Back to Main Menu")
+        choice = input("Choose an option: ")
+
+        if choice == '1':
+            amount = to_minor(input("Enter amount: "))
+            category = input("Enter category: ")
+            description = input("Enter description: ")
+            transaction_type = input("Enter type (income/expense): ").lower()
+            schedule = input("Schedule (daily/weekly/monthly, or 'day-of-month month day-of-week' such as '1 * *'): ")
+            start_date = input("Start date (YYYY-MM-DD): ")
+            end_date = input("End date (YYYY-MM-DD, optional): ") or None
+            transaction = Transaction(amount, category, description, transaction_type)
+            try:
+                db.add_recurring_rule(user_id, transaction, schedule, start_date, end_date)
+            except ValueError as e:
+                print(f"Invalid recurring transaction: {e}")
+                continue
+            print("Recurring transaction added.")
+            run_recurring(db, user_id)
+        elif choice == '2':
+            rules = db.get_recurring_rules(user_id)
+            if not rules:
+                print("No recurring transactions.")
+            for rule_id, txn, schedule, start_date, end_date, last_run in rules:
+                print(f"{rule_id}. {txn.type.capitalize()} - {format_amount(txn.amount, currency_symbol)} - {txn.category} - "
+                      f"{txn.description} ({schedule} from {start_date}{f' to {end_date}' if end_date else ''}, last run {last_run or 'never'})")
+        elif choice == '3':
+            rule_id = input("Rule number to remove: ")
+            if rule_id.isdigit() and db.delete_recurring_rule(user_id, int(rule_id)):
+                print("Recurring transaction removed.")
+            else:
+                print("No such recurring transaction.")
+        elif choice == '4':
+            if not run_recurring(db, user_id):
+                print("No recurring transactions are due.")
+        elif choice == '5':
+            break
+        else:
+            print("Invalid choice. Please try again.")
 
 def manage_budget(budget, currency_symbol):
+    from app.budget import Budget
     while True:
         print("\nBudget Management")
         print("1. Set Budget")
@@ -92,8 +206,12 @@ def manage_budget(budget, currency_symbol):
 
         if choice == '1':
             category = input("Enter category: ")
-            amount = float(input("Enter budget amount: "))
-            budget.set_budget(category, amount)
+            amount = to_minor(input("Enter budget amount: "))
+            period = input("Enter period (monthly/weekly) [monthly]: ").lower() or 'monthly'
+            if period not in Budget.PERIODS:
+                print("Invalid period. Please try again.")
+                continue
+            budget.set_budget(category, amount, period)
         elif choice == '2':
             budget.view_budgets()
         elif choice == '3':
@@ -102,63 +220,140 @@ def manage_budget(budget, currency_symbol):
             print("Invalid choice. Please try again.")        
 
 def cli_main():
-    db = Database()
-    current_user = None
+    # The connection is closed on exit, including via sys.exit
+    with Database() as db:
+        current_user = None
     
-    while True:
-        if not current_user:
-            choice = login_menu()
-            if choice == '1':
-                current_user = login(db)
-            elif choice == '2':
-                signup(db)
-            elif choice == '3':
-                print("Thank you for using FinWise!")
-                sys.exit(0)
-            else:
-                print("Invalid choice. Please try again.")
-        else:
-            # Ask user to set currency symbol if not already set
-            try:
-                CURRENCY_SYMBOL = load_currency_symbol()
-            except:
-                currency_symbol = input("Enter your preferred currency symbol: ")
-                save_currency_symbol(currency_symbol)
-                CURRENCY_SYMBOL = load_currency_symbol()
-
-            budget = Budget(CURRENCY_SYMBOL)
-
-            while current_user:
-                choice = main_menu()
+        while True:
+            if not current_user:
+                choice = login_menu()
                 if choice == '1':
-                    add_transaction(db, CURRENCY_SYMBOL, current_user.id)
+                    current_user = login(db)
+                    if current_user:
+                        run_recurring(db, current_user.id)
                 elif choice == '2':
-                    view_transactions(db, CURRENCY_SYMBOL, current_user.id)
+                    signup(db)
                 elif choice == '3':
-                    generate_report(db, CURRENCY_SYMBOL, current_user.id)
-                elif choice == '4':
-                    manage_budget(budget, CURRENCY_SYMBOL)
-                elif choice == '5':
-                    # Clear all transactions
-                    db.clear_transactions(current_user.id)
-                elif choice == '6':
-                    export_report_to_csv(db, CURRENCY_SYMBOL, current_user.id)
-                elif choice == '7':
-                    print("Logging out...")
-                    current_user = None
-                    break
+                    print("Thank you for using FinWise!")
+                    sys.exit(0)
                 else:
                     print("Invalid choice. Please try again.")
+            else:
+                # Ask user to set currency symbol if not already set
+                try:
+                    CURRENCY_SYMBOL = load_currency_symbol()
+                except:
+                    currency_symbol = input("Enter your preferred currency symbol: ")
+                    save_currency_symbol(currency_symbol)
+                    CURRENCY_SYMBOL = load_currency_symbol()
+
+                from app.budget import Budget
+                budget = Budget(db, current_user.id, CURRENCY_SYMBOL)
+
+                while current_user:
+                    choice = main_menu()
+                    if choice == '1':
+                        add_transaction(db, CURRENCY_SYMBOL, current_user.id, budget)
+                    elif choice == '2':
+                        view_transactions(db, CURRENCY_SYMBOL, current_user.id)
+                    elif choice == '3':
+                        show_report(db, CURRENCY_SYMBOL, current_user.id)
+                    elif choice == '4':
+                        manage_budget(budget, CURRENCY_SYMBOL)
+                    elif choice == '5':
+                        # Clear all transactions
+                        db.clear_transactions(current_user.id)
+                    elif choice == '6':
+                        export_transactions(db, CURRENCY_SYMBOL, current_user.id)
+                    elif choice == '7':
+                        search_transactions(db, CURRENCY_SYMBOL, current_user.id)
+                    elif choice == '8':
+                        manage_recurring(db, CURRENCY_SYMBOL, current_user.id)
+                    elif choice == '9':
+                        print("Logging out...")
+                        current_user = None
+                        break
+                    else:
+                        print("Invalid choice. Please try again.")
+
+def import_main(filename):
+    from app.importer import import_transactions
+
+    def show_progress(inserted, skipped):
+        print(f"\rImported {inserted} transactions, skipped {skipped} duplicates...", end="", flush=True)
+
+    with Database() as db:
+        user = login(db)
+        if not user:
+            sys.exit(1)
+        inserted, skipped = import_transactions(db, user.id, filename, load_import_batch_size(), show_progress)
+    if inserted or skipped:
+        print()
+    print(f"Import finished: {inserted} added, {skipped} already present.")
+
+def explain_queries(db):
+    print("\nQuery Plans")
+    for name, (uses_index, plan) in db.explain_hot_queries().items():
+        status = "uses index" if uses_index else "FULL SCAN"
+        print(f"{name}: {status}")
+        for line in plan:
+            print(f"    {line}")
+
+def summary_main(rebuild):
+    with Database() as db:
+        if rebuild:
+            db.rebuild_summary()
+            print("Summary table rebuilt.")
+        drift = db.verify_summary()
+    if not drift:
+        print("Summary table matches the transactions.")
+        return
+    print(f"{len(drift)} summary rows have drifted:")
+    for user_id, month, txn_type, category_id, expected, stored in drift:
+        print(f"    user {user_id} {month} {txn_type} category {category_id}: expected {expected}, stored {stored}")
+    print("Run 'python main.py --rebuild-summary' to repair them.")
+    sys.exit(1)
 
 def gui_main():
+    # Without a display Tk cannot start, so don't pay for importing it
+    if sys.platform.startswith('linux') and not (os.environ.get('DISPLAY') or os.environ.get('WAYLAND_DISPLAY')):
+        raise RuntimeError("no display available")
     # Import here to avoid circular imports
     from app.gui import start_gui
     start_gui()
 
+def setup_metrics():
+    # --stats can be combined with any mode and prints the metrics on exit
+    if '--stats' in sys.argv:
+        sys.argv.remove('--stats')
+        atexit.register(lambda: print("\nOperation Metrics\n" + metrics.format_table()))
+    config = load_config()
+    configure_logging(config['SLOW_QUERY_LOG'])
+    if config['METRICS_FILE']:
+        atexit.register(metrics.dump, config['METRICS_FILE'])
+
 def main():
+    setup_metrics()
     # Check for command line arguments
-    if len(sys.argv) > 1 and sys.argv[1].lower() == '--cli':
+    option = sys.argv[1].lower() if len(sys.argv) > 1 else None
+    if option == '--cli':
         cli_main()
+    elif option == '--import':
+        if len(sys.argv) < 3:
+            print("Usage: python main.py --import FILE")
+            sys.exit(1)
+        import_main(sys.argv[2])
+    elif option in ('--verify-summary', '--rebuild-summary'):
+        summary_main(rebuild=option == '--rebuild-summary')
+    elif option == '--explain':
+        with Database() as db:
+            explain_queries(db)
+    elif option == 'batch':
+        from app.batch import main as batch_main
+        sys.exit(batch_main(sys.argv[2:]))
+    elif option == 'serve':
+        from app.server import main as serve_main
+        sys.exit(serve_main(sys.argv[2:]))
     else:
         # Default to GUI mode
         try: